@@ -0,0 +1,150 @@
+import os
+import math
+import time
+import asyncio
+from collections import OrderedDict
+from fastapi import HTTPException
+from settings import getenv
+
+ADMISSION_RETRY_AFTER = int(getenv("ADMISSION_RETRY_AFTER", "1"))
+
+LOGIN_CONCURRENCY = int(getenv("LOGIN_CONCURRENCY", str(os.cpu_count() or 1)))
+LOGIN_QUEUE_SIZE = int(getenv("LOGIN_QUEUE_SIZE", str(4 * LOGIN_CONCURRENCY)))
+LOGIN_QUEUE_TIMEOUT = float(getenv("LOGIN_QUEUE_TIMEOUT", "2.0"))
+
+SIGNUP_CONCURRENCY = int(getenv("SIGNUP_CONCURRENCY", "2"))
+SIGNUP_QUEUE_SIZE = int(getenv("SIGNUP_QUEUE_SIZE", "8"))
+SIGNUP_QUEUE_TIMEOUT = float(getenv("SIGNUP_QUEUE_TIMEOUT", "2.0"))
+
+BULK_CONCURRENCY = int(getenv("BULK_CONCURRENCY", "4"))
+BULK_QUEUE_SIZE = int(getenv("BULK_QUEUE_SIZE", "16"))
+BULK_QUEUE_TIMEOUT = float(getenv("BULK_QUEUE_TIMEOUT", "5.0"))
+
+# Login attempts per minute, and how many can come at once, for a single
+# username and for a single client address. Buckets are per worker.
+LOGIN_USERNAME_RATE = float(getenv("LOGIN_USERNAME_RATE", "10"))
+LOGIN_USERNAME_BURST = int(getenv("LOGIN_USERNAME_BURST", "5"))
+LOGIN_IP_RATE = float(getenv("LOGIN_IP_RATE", "60"))
+LOGIN_IP_BURST = int(getenv("LOGIN_IP_BURST", "20"))
+RATE_LIMIT_KEYS = int(getenv("RATE_LIMIT_KEYS", "100000"))
+
+
+def unavailable(detail: str, retry_after: int = ADMISSION_RETRY_AFTER):
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+class Limiter:
+    # At most `concurrency` requests of a route group run at once. Up to
+    # `queue_size` more wait for a slot, for at most `queue_timeout`
+    # seconds; anything beyond that is turned away with a 503 straight
+    # away, so a flood of expensive requests can't pile up and starve the
+    # cheap ones. Used as a route dependency.
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.slots = asyncio.Semaphore(concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    async def __call__(self):
+        if self.slots.locked():
+            if self.waiting >= self.queue_size:
+                self.shed += 1
+                raise unavailable("Server is busy, try again shortly")
+
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            try:
+                await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise unavailable("Server is busy, try again shortly")
+            finally:
+                self.waiting -= 1
+        else:
+            await self.slots.acquire()
+
+        self.admitted += 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self.slots.release()
+
+
+class TokenBuckets:
+    # One bucket per key, refilled at `rate` tokens a minute up to `burst`.
+    # The least recently seen keys are dropped past `max_keys`, which only
+    # ever hands a forgotten key a full bucket again.
+    def __init__(self, name: str, rate: float, burst: int, max_keys: int = RATE_LIMIT_KEYS):
+        self.name = name
+        self.rate = rate / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.limited = 0
+
+    def take(self, key: str):
+        # Returns 0 when the request may go ahead, otherwise the seconds
+        # until the bucket has a token again.
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            self.limited += 1
+            return (1 - tokens) / self.rate
+
+        self.buckets[key] = (tokens - 1, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return 0
+
+
+login_limiter = Limiter("login", LOGIN_CONCURRENCY, LOGIN_QUEUE_SIZE, LOGIN_QUEUE_TIMEOUT)
+signup_limiter = Limiter("signup", SIGNUP_CONCURRENCY, SIGNUP_QUEUE_SIZE, SIGNUP_QUEUE_TIMEOUT)
+bulk_limiter = Limiter("bulk", BULK_CONCURRENCY, BULK_QUEUE_SIZE, BULK_QUEUE_TIMEOUT)
+limiters = (login_limiter, signup_limiter, bulk_limiter)
+
+login_username_buckets = TokenBuckets("username", LOGIN_USERNAME_RATE, LOGIN_USERNAME_BURST)
+login_ip_buckets = TokenBuckets("ip", LOGIN_IP_RATE, LOGIN_IP_BURST)
+rate_limits = (login_username_buckets, login_ip_buckets)
+
+
+def check_login_rate(username: str, client_ip: str):
+    # The address is checked first, so a client already over its own
+    # limit can't also use up the buckets of the usernames it tries.
+    for buckets, key in ((login_ip_buckets, client_ip), (login_username_buckets, username)):
+        wait = buckets.take(key)
+        if wait:
+            raise HTTPException(status_code=429, detail="Too many login attempts",
+                                headers={"Retry-After": str(math.ceil(wait))})
+
+
+def render_admission_stats():
+    counters = (
+        ("admission_in_flight", "gauge", lambda limiter: limiter.running),
+        ("admission_queue_depth", "gauge", lambda limiter: limiter.waiting),
+        ("admission_queue_depth_peak", "gauge", lambda limiter: limiter.peak_waiting),
+        ("admission_admitted_total", "counter", lambda limiter: limiter.admitted),
+        ("admission_shed_total", "counter", lambda limiter: limiter.shed),
+        ("admission_queue_timeouts_total", "counter", lambda limiter: limiter.timed_out),
+    )
+    lines = []
+    for name, kind, value in counters:
+        lines.append(f"# TYPE {name} {kind}")
+        for limiter in limiters:
+            lines.append(f'{name}{{budget="{limiter.name}"}} {value(limiter)}')
+
+    lines.append("# TYPE rate_limited_total counter")
+    for buckets in rate_limits:
+        lines.append(f'rate_limited_total{{key="{buckets.name}"}} {buckets.limited}')
+    return lines
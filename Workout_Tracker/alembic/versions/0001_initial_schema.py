@@ -0,0 +1,75 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=100), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_table(
+        'exercises',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.String(length=500), nullable=True),
+        sa.Column('category', sa.Enum('cardio', 'strength', 'flexibility', name='categoryenum'), nullable=False),
+        sa.Column('muscle_category', sa.Enum('chest', 'back', 'legs', 'hands', 'shoulders',
+                                             name='musclegroupenum'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_table(
+        'workout_plan',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('schedule', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.Enum('pending', 'completed', 'skipped', name='statusenum'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'workout_exercises',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('workout_plan_id', sa.Integer(), nullable=False),
+        sa.Column('exercise_id', sa.Integer(), nullable=False),
+        sa.Column('sets', sa.Integer(), nullable=False),
+        sa.Column('reps', sa.Integer(), nullable=False),
+        sa.Column('weight', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['exercise_id'], ['exercises.id']),
+        sa.ForeignKeyConstraint(['workout_plan_id'], ['workout_plan.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('workout_exercises')
+    op.drop_table('workout_plan')
+    op.drop_table('exercises')
+    op.drop_table('users')
+    sa.Enum(name='statusenum').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='musclegroupenum').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='categoryenum').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,40 @@
+"""indexes for the per-user and per-plan lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_workout_plan_user_id_schedule', 'workout_plan', ['user_id', 'schedule'])
+    op.create_index('ix_workout_plan_user_id_status', 'workout_plan', ['user_id', 'status'])
+    op.create_index('ix_workout_exercises_workout_plan_id_exercise_id', 'workout_exercises',
+                    ['workout_plan_id', 'exercise_id'])
+    op.create_index('ix_workout_exercises_exercise_id', 'workout_exercises', ['exercise_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # MySQL backs the foreign keys with these indexes, so it keeps the plain
+    # exercise_id one and gets single-column ones back before the composites go.
+    if op.get_bind().dialect.name == 'mysql':
+        op.create_index('ix_workout_plan_user_id', 'workout_plan', ['user_id'])
+        op.create_index('ix_workout_exercises_workout_plan_id', 'workout_exercises', ['workout_plan_id'])
+    else:
+        op.drop_index('ix_workout_exercises_exercise_id', table_name='workout_exercises')
+    op.drop_index('ix_workout_exercises_workout_plan_id_exercise_id', table_name='workout_exercises')
+    op.drop_index('ix_workout_plan_user_id_status', table_name='workout_plan')
+    op.drop_index('ix_workout_plan_user_id_schedule', table_name='workout_plan')
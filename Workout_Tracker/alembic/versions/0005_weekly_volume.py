@@ -0,0 +1,46 @@
+"""weekly volume rollup
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def existing_enum(name, *values):
+    # The enum types were created with the exercises table.
+    return sa.Enum(*values, name=name).with_variant(postgresql.ENUM(*values, name=name, create_type=False),
+                                                   'postgresql')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'weekly_volume',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('muscle_category', existing_enum('musclegroupenum', 'chest', 'back', 'legs', 'hands',
+                                                   'shoulders'), nullable=False),
+        sa.Column('category', existing_enum('categoryenum', 'cardio', 'strength', 'flexibility'), nullable=False),
+        sa.Column('sets', sa.Integer(), nullable=False),
+        sa.Column('volume', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'week_start', 'muscle_category', 'category'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('weekly_volume')
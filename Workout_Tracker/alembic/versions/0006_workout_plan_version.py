@@ -0,0 +1,33 @@
+"""workout plan version
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A constant server default fills in existing plans; Postgres and
+    # MySQL 8 add it without rewriting the table.
+    op.add_column('workout_plan', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Batch mode so SQLite, which can't drop columns in place, copies the
+    # table instead.
+    with op.batch_alter_table('workout_plan') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,50 @@
+"""cascade workout exercise deletes
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# SQLite's foreign keys have no names; batch mode names them with this
+# convention while it copies the table, so they can be dropped.
+naming_convention = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+foreign_keys = (('workout_plan_id', 'workout_plan'), ('exercise_id', 'exercises'))
+
+
+def foreign_key_name(column, referred_table):
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys('workout_exercises'):
+        if foreign_key['constrained_columns'] == [column] and foreign_key['name']:
+            return foreign_key['name']
+    return f'fk_workout_exercises_{column}_{referred_table}'
+
+
+def replace_foreign_keys(ondelete) -> None:
+    names = {column: foreign_key_name(column, referred_table) for column, referred_table in foreign_keys}
+    with op.batch_alter_table('workout_exercises', naming_convention=naming_convention) as batch_op:
+        for column, referred_table in foreign_keys:
+            batch_op.drop_constraint(names[column], type_='foreignkey')
+            batch_op.create_foreign_key(f'fk_workout_exercises_{column}_{referred_table}', referred_table,
+                                        [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    replace_foreign_keys('CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    replace_foreign_keys(None)
@@ -0,0 +1,28 @@
+"""workout exercises plan id index
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0013'
+down_revision: Union[str, Sequence[str], None] = '0012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A plan's exercises are paged and exported in id order.
+    op.create_index('ix_workout_exercises_workout_plan_id_id', 'workout_exercises', ['workout_plan_id', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_workout_exercises_workout_plan_id_id', table_name='workout_exercises')
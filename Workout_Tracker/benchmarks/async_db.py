@@ -0,0 +1,63 @@
+"""Requests/sec of the read endpoints under concurrent clients.
+
+Run from the Workout_Tracker directory:
+
+    python -m benchmarks.async_db --clients 10 --requests 2000 --db-latency-ms 5
+
+``--db-latency-ms`` adds a simulated database round trip to every statement.
+With the blocking session that sleep stalls the event loop; with the async
+session it runs on the driver thread and other requests keep going.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import add_db_latency, reset_database
+
+import httpx
+
+from main import app
+
+
+async def prepare(client):
+    await client.post("/auth/user", json={"username": "bench", "password": "bench", "is_active": True})
+    response = await client.post("/auth/token", data={"username": "bench", "password": "bench"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    for day in range(1, 21):
+        await client.post("/workout_plan/", headers=headers,
+                          json={"schedule": f"{day:02d}-01-2025 08:00", "status": "pending"})
+    return headers
+
+
+async def run(client, path, headers, clients, total):
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return total / (time.perf_counter() - started)
+
+
+async def main(args):
+    reset_database()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = await prepare(client)
+        if args.db_latency_ms:
+            add_db_latency(args.db_latency_ms / 1000)
+        for path in ("/exercises/", "/workout_plan/"):
+            rps = await run(client, path, headers, args.clients, args.requests)
+            print(f"{path:<20} clients={args.clients:<4} {rps:10.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,44 @@
+"""Microbenchmark of the get_current_user dependency, cache hit vs miss.
+
+Run from the Workout_Tracker directory:
+
+    python -m benchmarks.auth_cache --iterations 20000
+
+A miss runs the full jwt.decode signature check; a hit is a SHA-256 of
+the token plus an LRU lookup. Both include the deactivated/revoked check.
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+
+from benchmarks.common import reset_database
+
+from routers.auth import create_access_token, get_current_user
+from token_cache import claims_cache
+
+
+async def measure(token, iterations, clear):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if clear:
+            claims_cache.clear()
+        await get_current_user(token)
+    return (time.perf_counter() - started) / iterations
+
+
+async def main(args):
+    reset_database()
+    token = create_access_token("bench", 1, False, timedelta(minutes=20))
+    await get_current_user(token)
+
+    miss = await measure(token, args.iterations, clear=True)
+    hit = await measure(token, args.iterations, clear=False)
+    print(f"cache miss  {miss * 1e6:8.2f} us/call")
+    print(f"cache hit   {hit * 1e6:8.2f} us/call  ({miss / hit:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
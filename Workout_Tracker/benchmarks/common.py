@@ -0,0 +1,72 @@
+"""Shared setup for the benchmark scripts.
+
+Importing this module points the app at a scratch SQLite file unless
+DATABASE_URL is already set, so it has to be imported before ``main``.
+"""
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+DB_FILE = os.path.join(tempfile.gettempdir(), "workout_tracker_bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_FILE}")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+# Every benchmark logs in as the same few users from one address, which
+# the production login rate limits would throttle after a handful. The
+# admission queues keep their concurrency but never shed: a burst shows
+# up as queueing in the latencies rather than as 503s.
+for name in ("LOGIN_USERNAME_RATE", "LOGIN_USERNAME_BURST", "LOGIN_IP_RATE", "LOGIN_IP_BURST",
+             "LOGIN_QUEUE_SIZE", "SIGNUP_QUEUE_SIZE", "BULK_QUEUE_SIZE",
+             "LOGIN_QUEUE_TIMEOUT", "SIGNUP_QUEUE_TIMEOUT", "BULK_QUEUE_TIMEOUT"):
+    os.environ.setdefault(name, "1000000")
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import database
+from database import Base, engine
+from seed_exercises import seed_exercise
+
+
+def reset_database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    seed_exercise()
+
+
+class SlowCursor(sqlite3.Cursor):
+    latency = 0.0
+
+    def execute(self, *args):
+        time.sleep(self.latency)
+        return super().execute(*args)
+
+
+class SlowConnection(sqlite3.Connection):
+    def cursor(self, factory=SlowCursor):
+        return super().cursor(factory)
+
+
+def add_db_latency(latency):
+    # Sleeps inside every SQLite cursor execute to stand in for the network
+    # round trip of a real MySQL/Postgres server. With the async session
+    # the sleep happens on the driver thread, not the event loop.
+    SlowCursor.latency = latency
+    connect_args = {"factory": SlowConnection}
+    database.SessionLocal.configure(bind=create_engine(database.DATABASE_URL, connect_args=connect_args))
+    if hasattr(database, "AsyncSessionLocal"):
+        async_engine = create_async_engine(database.ASYNC_DATABASE_URL, connect_args=connect_args)
+        database.AsyncSessionLocal.configure(bind=async_engine)
+        database.AsyncReadSessionLocal.configure(bind=async_engine.execution_options(isolation_level="AUTOCOMMIT"))
+
+
+def percentiles(latencies):
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98], "max": max(latencies)}
+
+
+def summary(latencies):
+    stats = percentiles(latencies)
+    return (f"n={len(latencies):<5} p50={stats['p50'] * 1000:8.1f} ms "
+            f"p95={stats['p95'] * 1000:8.1f} ms max={stats['max'] * 1000:8.1f} ms")
@@ -0,0 +1,198 @@
+"""Throughput, latency percentiles and SQL statements per request, per endpoint.
+
+Run from the Workout_Tracker directory:
+
+    python -m benchmarks.endpoints --concurrency 16 --requests 500 --output run.json
+    python -m benchmarks.endpoints --baseline run.json
+
+Every scenario runs on its own against the FastAPI app in-process over a
+seeded dataset (see generate_dataset.py), so the statement counter only
+sees that scenario's SQL. Results are printed as a table and, with
+``--output``, written as JSON. ``--baseline`` compares against an earlier
+JSON file and exits non-zero when an endpoint got slower than
+``--tolerance`` allows.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from argparse import Namespace
+
+from benchmarks.common import add_db_latency, percentiles, reset_database
+
+import httpx
+from sqlalchemy import event
+
+import database
+from main import app
+from generate_dataset import generate
+
+
+class Scenario:
+    def __init__(self, name, method, path, **kwargs):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.kwargs = kwargs
+
+    def request(self, number, context):
+        path = self.path(number, context) if callable(self.path) else self.path
+        kwargs = {key: value(number, context) if callable(value) else value for key, value in self.kwargs.items()}
+        kwargs.setdefault("headers", context["headers"])
+        return self.method, path, kwargs
+
+
+def bulk_items(number, context):
+    return [{"exercise_id": exercise_id, "sets": 3, "reps": 8, "weight": 40.0} for exercise_id in range(1, 9)]
+
+
+SCENARIOS = [
+    Scenario("auth.signup", "POST", "/auth/user", headers={},
+             json=lambda n, c: {"username": f"signup-{c['run']}-{n}", "password": "bench", "is_active": True}),
+    Scenario("auth.login", "POST", "/auth/token", headers={}, data={"username": "bench", "password": "bench"}),
+    Scenario("exercises.list", "GET", "/exercises/"),
+    Scenario("exercises.list_filtered", "GET", "/exercises/", params={"category": "strength", "limit": 20}),
+    Scenario("exercises.get", "GET", lambda n, c: f"/exercises/{n % 14 + 1}"),
+    Scenario("workout_plan.list", "GET", "/workout_plan/"),
+    Scenario("workout_plan.list_filtered", "GET", "/workout_plan/", params={"status": "completed", "limit": 20}),
+    Scenario("workout_plan.get", "GET", lambda n, c: f"/workout_plan/{c['plan_ids'][n % len(c['plan_ids'])]}"),
+    Scenario("workout_plan.full", "GET", lambda n, c: f"/workout_plan/{c['plan_ids'][n % len(c['plan_ids'])]}/full"),
+    Scenario("workout_plan.create", "POST", "/workout_plan/",
+             json={"schedule": "01-06-2025 08:00", "status": "pending"}),
+    Scenario("workout_plan.change_status", "PATCH",
+             lambda n, c: f"/workout_plan/{c['plan_ids'][n % len(c['plan_ids'])]}/status",
+             json=lambda n, c: {"status": ("completed", "pending")[n % 2]}),
+    Scenario("workout_exercises.list", "GET", "/workout_exercises/",
+             params=lambda n, c: {"plan_id": c["plan_ids"][n % len(c["plan_ids"])]}),
+    Scenario("workout_exercises.add", "POST", "/workout_exercises/",
+             params=lambda n, c: {"plan_id": c["plan_ids"][n % len(c["plan_ids"])], "exercise_id": n % 14 + 1},
+             json={"sets": 3, "reps": 8, "weight": 40.0}),
+    Scenario("workout_exercises.bulk", "POST", "/workout_exercises/bulk",
+             params=lambda n, c: {"plan_id": c["plan_ids"][n % len(c["plan_ids"])]}, json=bulk_items),
+    Scenario("analytics.volume", "GET", "/analytics/volume", params={"until": "2025-01-31", "weeks": 8}),
+]
+
+
+async def prepare(client, args):
+    generate(Namespace(users=args.users, plans_per_user=args.plans_per_user, exercises=0,
+                       days=365, batch_size=5000, seed=args.seed))
+    await client.post("/auth/user", json={"username": "bench", "password": "bench", "is_active": True})
+    response = await client.post("/auth/token", data={"username": "bench", "password": "bench"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    plan_ids = []
+    for day in range(1, 21):
+        response = await client.post("/workout_plan/", headers=headers,
+                                     json={"schedule": f"{day:02d}-01-2025 08:00", "status": "completed"})
+        plan_ids.append(response.json()["id"])
+        await client.post("/workout_exercises/bulk", headers=headers, params={"plan_id": plan_ids[-1]},
+                          json=bulk_items(day, None)[:6])
+    return {"headers": headers, "plan_ids": plan_ids, "run": int(time.time())}
+
+
+async def run_scenario(client, scenario, context, args, statements):
+    numbers = iter(range(args.requests))
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for number in numbers:
+            method, path, kwargs = scenario.request(number, context)
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    statements[0] = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": args.requests,
+        "errors": errors,
+        "throughput": args.requests / elapsed,
+        **{key: value * 1000 for key, value in percentiles(latencies).items()},
+        "sql_per_request": statements[0] / args.requests,
+    }
+
+
+def print_results(results, baseline=None):
+    header = f"{'endpoint':<28} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql/req':>8} {'errors':>6}"
+    print(header + ("  p95 vs baseline" if baseline else ""))
+    for name, result in results.items():
+        line = (f"{name:<28} {result['throughput']:9.1f} {result['p50']:8.2f} {result['p95']:8.2f} "
+                f"{result['p99']:8.2f} {result['sql_per_request']:8.2f} {result['errors']:6d}")
+        if baseline and name in baseline:
+            line += f"  {(result['p95'] / baseline[name]['p95'] - 1) * 100:+7.1f}%"
+        print(line)
+
+
+def regressions(results, baseline, tolerance):
+    slower = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result["p95"] > before["p95"] * (1 + tolerance) or result["sql_per_request"] > before["sql_per_request"]:
+            slower.append(name)
+    return slower
+
+
+async def main(args):
+    reset_database()
+    if args.db_latency_ms:
+        add_db_latency(args.db_latency_ms / 1000)
+
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    selected = [scenario for scenario in SCENARIOS
+                if not args.only or any(scenario.name.startswith(prefix) for prefix in args.only)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        context = await prepare(client, args)
+        # Attach after setup, and to whatever engine the session now uses.
+        bind = database.AsyncSessionLocal.kw["bind"].sync_engine
+        event.listen(bind, "before_cursor_execute", count)
+        results = {}
+        for scenario in selected:
+            results[scenario.name] = await run_scenario(client, scenario, context, args, statements)
+        event.remove(bind, "before_cursor_execute", count)
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    baseline = json.load(open(args.baseline))["results"] if args.baseline else None
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if baseline:
+        slower = regressions(results, baseline, args.tolerance)
+        if slower:
+            print(f"Slower than baseline: {', '.join(slower)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--users", type=int, default=200, help="background users in the dataset")
+    parser.add_argument("--plans-per-user", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--only", nargs="*", help="endpoint name prefixes to run, e.g. auth workout_plan.list")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p95 slowdown vs baseline")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,64 @@
+"""Login latency under a concurrent burst, and what it does to cheap reads.
+
+Run from the Workout_Tracker directory:
+
+    python -m benchmarks.login --logins 64 --clients 16
+
+While ``--clients`` coroutines log in ``--logins`` times in total, one
+more coroutine keeps reading GET /exercises/1. If bcrypt runs on the event
+loop, that read waits behind every hash.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import reset_database, summary
+
+import httpx
+
+from main import app
+
+
+async def timed(client, method, path, **kwargs):
+    started = time.perf_counter()
+    response = await client.request(method, path, **kwargs)
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def main(args):
+    reset_database()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/user", json={"username": "bench", "password": "bench", "is_active": True})
+        credentials = {"username": "bench", "password": "bench"}
+
+        remaining = iter(range(args.logins))
+        login_latencies, read_latencies = [], []
+        done = asyncio.Event()
+
+        async def login_worker():
+            for _ in remaining:
+                login_latencies.append(await timed(client, "POST", "/auth/token", data=credentials))
+
+        async def reader():
+            while not done.is_set():
+                read_latencies.append(await timed(client, "GET", "/exercises/1"))
+
+        started = time.perf_counter()
+        read_task = asyncio.create_task(reader())
+        await asyncio.gather(*(login_worker() for _ in range(args.clients)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await read_task
+
+    print(f"logins     {summary(login_latencies)}  {args.logins / elapsed:.1f} logins/s")
+    print(f"reads      {summary(read_latencies)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
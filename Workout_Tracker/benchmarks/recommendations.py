@@ -0,0 +1,88 @@
+"""Throughput of the nightly recommendation run, in workout exercises a second.
+
+Run from the Workout_Tracker directory:
+
+    python -m benchmarks.recommendations --rows 2000000 --db-rows 200000
+
+"compute" times recommend() alone on synthetic history arrays already in
+memory. "end to end" seeds the scratch SQLite database and times the
+whole run: the chunked history queries, the array maths and writing the
+recommendations back.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import reset_database
+
+import numpy as np
+from sqlalchemy import insert
+
+import recommendations
+from database import SessionLocal
+from models import Users, Workout_Plan, Workout_Exercises, StatusEnum
+
+NOW = datetime(2026, 1, 1)
+
+
+def history(rows, users, seed=1):
+    # Three exercises per session, a session every other day or so, sorted
+    # the way the history query returns them.
+    rng = np.random.default_rng(seed)
+    plans = rows // 3
+    plan_user = np.sort(rng.integers(1, users + 1, plans))
+    user = np.repeat(plan_user, 3)
+    plan = np.repeat(np.arange(1, plans + 1), 3)
+    exercise = rng.integers(1, 15, plans * 3)
+    reps = rng.integers(3, 13, plans * 3)
+    sets = rng.integers(1, 6, plans * 3)
+    weight = np.round(rng.uniform(20, 150, plans * 3) / 2.5) * 2.5
+    order = np.lexsort((plan, exercise, user))
+    return tuple(column[order] for column in (user, exercise, plan, sets, reps, weight))
+
+
+def seed(rows, users):
+    user, exercise, plan, sets, reps, weight = history(rows, users)
+    plan_ids, first = np.unique(plan, return_index=True)
+    db = SessionLocal()
+    db.execute(insert(Users), [{"id": user_id, "username": f"bench{user_id}", "hashed_password": "x",
+                                "is_active": True, "is_admin": False} for user_id in range(1, users + 1)])
+    db.execute(insert(Workout_Plan), [{"id": plan_id, "user_id": user_id, "status": StatusEnum.completed,
+                                       "schedule": NOW - timedelta(hours=int(plan_id) % 2000)}
+                                      for plan_id, user_id in zip(plan_ids.tolist(), user[first].tolist())])
+    db.execute(insert(Workout_Exercises.__table__),
+               [{"workout_plan_id": plan_id, "exercise_id": exercise_id, "sets": set_count, "reps": rep_count,
+                 "weight": amount} for plan_id, exercise_id, set_count, rep_count, amount in
+                zip(plan.tolist(), exercise.tolist(), sets.tolist(), reps.tolist(), weight.tolist())])
+    db.commit()
+    db.close()
+
+
+def main(args):
+    columns = history(args.rows, args.users)
+    recommendations.recommend(*history(1000, 10))
+    started = time.perf_counter()
+    written = len(recommendations.recommend(*columns)["user_id"])
+    elapsed = time.perf_counter() - started
+    print(f"{'compute':12s} {args.rows:>9} rows {elapsed:7.2f}s {args.rows / elapsed:12,.0f} rows/s  "
+          f"{written} recommendations")
+
+    if not args.db_rows:
+        return
+    reset_database()
+    seed(args.db_rows, args.users)
+    db = SessionLocal()
+    started = time.perf_counter()
+    read, written = recommendations.run(db, now=NOW)
+    elapsed = time.perf_counter() - started
+    db.close()
+    print(f"{'end to end':12s} {read:>9} rows {elapsed:7.2f}s {read / elapsed:12,.0f} rows/s  "
+          f"{written} recommendations")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--db-rows", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=5000)
+    main(parser.parse_args())
@@ -0,0 +1,70 @@
+"""Exercise search index: build time, incremental update and query latency.
+
+Run from the Workout_Tracker directory:
+
+    python -m benchmarks.search --exercises 50000 --iterations 200
+
+The catalog is the seed exercises repeated with a numbered suffix, so
+names share most of their trigrams and every query has plenty of
+candidates to rank. Nothing touches the database, but importing the
+seed data imports ``database``, which needs a URL to build its engines.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'workout_tracker_bench.db')}")
+
+from search_index import SearchIndex
+from seed_exercises import exercise_data
+
+QUERIES = [
+    ("bench pres", {}),
+    ("benhc press", {}),
+    ("deadlift", {"category": "strength"}),
+    ("squat", {"muscle_category": "legs"}),
+    ("variation 12345", {}),
+    ("", {"category": "cardio"}),
+    ("zzzz", {}),
+]
+
+
+def catalog(size):
+    rng = random.Random(1)
+    exercises = []
+    for exercise_id in range(1, size + 1):
+        base = rng.choice(exercise_data)
+        exercises.append(SimpleNamespace(id=exercise_id, name=f"{base['name']} variation {exercise_id}",
+                                         description=base["description"], category=base["category"],
+                                         muscle_category=base["muscle_category"]))
+    return exercises
+
+
+def main(args):
+    exercises = catalog(args.exercises)
+
+    started = time.perf_counter()
+    index = SearchIndex.build(exercises)
+    print(f"{args.exercises} exercises, build {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    for exercise in exercises[:args.iterations]:
+        index.add(SimpleNamespace(**dict(vars(exercise), name=f"Zercher squat {exercise.id}")))
+    print(f"{'incremental update':28s} {(time.perf_counter() - started) / args.iterations * 1e6:8.0f} us")
+
+    for query, filters in QUERIES:
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            index.search(query, 20, **filters)
+        label = f"{query!r} {' '.join(filters.values())}"
+        print(f"{label:28s} {(time.perf_counter() - started) / args.iterations * 1e6:8.0f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--exercises", type=int, default=50000)
+    parser.add_argument("--iterations", type=int, default=200)
+    main(parser.parse_args())
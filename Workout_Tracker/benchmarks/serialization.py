@@ -0,0 +1,112 @@
+"""Cost of loading and serializing a 1,000-item plan list, old path vs new.
+
+Run from the Workout_Tracker directory:
+
+    python -m benchmarks.serialization --items 1000 --iterations 50
+
+"before" is what GET /workout_plan/ used to do: load ORM objects and hand
+them to FastAPI's generic jsonable_encoder. "after" selects plain row
+tuples and lets the Pydantic response model dump them straight to JSON
+bytes. The ORJSONResponse line shows why it is not the default: any
+custom response class turns off FastAPI's Pydantic-to-bytes fast path.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import warnings
+from datetime import datetime, timedelta
+
+from benchmarks.common import reset_database
+
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import insert, select
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from database import AsyncReadSessionLocal, SessionLocal
+from models import Users, Workout_Plan, StatusEnum
+from pagination import Page
+from routers.workout_plan import WorkoutPlanResponce, plan_columns
+
+
+def seed(items):
+    db = SessionLocal()
+    db.add(Users(id=1, username="bench", hashed_password="x", is_active=True, is_admin=False))
+    # The session doesn't autoflush, and the plans' foreign key needs the user.
+    db.flush()
+    start = datetime(2025, 1, 1, 8, 0)
+    db.execute(insert(Workout_Plan), [{"user_id": 1, "schedule": start + timedelta(days=day),
+                                       "status": StatusEnum.completed} for day in range(items)])
+    db.commit()
+    db.close()
+
+
+def build_app(items):
+    app = FastAPI()
+
+    async def load(query):
+        async with AsyncReadSessionLocal() as db:
+            return (await db.execute(query.filter(Workout_Plan.user_id == 1).order_by(Workout_Plan.id)
+                                     .limit(items))).all()
+
+    @app.get("/before")
+    async def before():
+        # The version column came in with ETags and isn't part of the
+        # response, so it is left out to keep the bodies comparable.
+        plans = [jsonable_encoder(row[0], exclude={"version"}) for row in await load(select(Workout_Plan))]
+        return {"items": plans, "next_cursor": None}
+
+    @app.get("/orm", response_model=Page[WorkoutPlanResponce])
+    async def orm():
+        return {"items": [row[0] for row in await load(select(Workout_Plan))], "next_cursor": None}
+
+    @app.get("/after", response_model=Page[WorkoutPlanResponce])
+    async def after():
+        return {"items": await load(select(*plan_columns)), "next_cursor": None}
+
+    @app.get("/orjson", response_model=Page[WorkoutPlanResponce], response_class=ORJSONResponse)
+    async def orjson_response():
+        return {"items": await load(select(*plan_columns)), "next_cursor": None}
+
+    return app
+
+
+async def main(args):
+    warnings.filterwarnings("ignore", message="ORJSONResponse is deprecated")
+    reset_database()
+    seed(args.items)
+    app = build_app(args.items)
+    variants = [("before", "ORM objects + jsonable_encoder"), ("orm", "ORM objects + response model"),
+                ("after", "row tuples + response model")]
+    if orjson:
+        variants.append(("orjson", "row tuples + ORJSONResponse"))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        bodies = {path: (await client.get(f"/{path}")).json() for path, _ in variants}
+        assert all(body == bodies["after"] for body in bodies.values()), "variants disagree"
+
+        print(f"{args.items} plans, median of {args.iterations} requests")
+        baseline = None
+        for path, label in variants:
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                await client.get(f"/{path}")
+                timings.append(time.perf_counter() - started)
+            median = statistics.median(timings)
+            baseline = baseline or median
+            print(f"{label:34s} {median * 1000:8.2f} ms  {baseline / median:5.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,114 @@
+import time
+import asyncio
+import bisect
+from types import SimpleNamespace
+from sqlalchemy import select, update
+from models import Exercise, CatalogVersion
+from search_index import SearchIndex
+import etags
+from settings import getenv
+
+# How long a worker trusts its cached version before asking the database
+# again. Writes made through this worker are visible immediately; writes
+# made through other workers show up after at most this many seconds.
+CATALOG_CHECK_INTERVAL = float(getenv("CATALOG_CHECK_INTERVAL", "1.0"))
+
+bump_catalog_version = update(CatalogVersion).values(version=CatalogVersion.version + 1)
+
+
+async def bump_version(db):
+    # Returns the version this transaction will commit; the UPDATE holds
+    # the row until then, so no other writer can take the same number.
+    result = await db.execute(bump_catalog_version)
+    if not result.rowcount:
+        db.add(CatalogVersion(id=1, version=1))
+        return 1
+    return await db.scalar(select(CatalogVersion.version))
+
+
+class CatalogCache:
+    def __init__(self, response_model):
+        self.response_model = response_model
+        self.version = None
+        self.checked_at = 0.0
+        self.items = {}
+        self.ids_by_facet = {}
+        self.search = SearchIndex()
+        self.lock = asyncio.Lock()
+
+    @property
+    def etag(self):
+        return f'"catalog-{self.version}"'
+
+    def matches(self, if_none_match):
+        return etags.matches(if_none_match, self.etag)
+
+    def invalidate(self):
+        self.version = None
+
+    @staticmethod
+    def facet_keys(exercise):
+        return ((None, None), (exercise.category, None),
+                (None, exercise.muscle_category), (exercise.category, exercise.muscle_category))
+
+    @classmethod
+    def build_facets(cls, exercises):
+        # Sorted ids for every (category, muscle_category) filter, with None
+        # standing for "any", so a filtered page is a bisect plus a slice.
+        facets = {}
+        for exercise in exercises:
+            for key in cls.facet_keys(exercise):
+                facets.setdefault(key, []).append(exercise.id)
+        return facets
+
+    def apply(self, version, exercise=None, removed_id=None):
+        # A write made through this worker patches the cache in place when
+        # it is the only change since the last load; otherwise the next
+        # load rebuilds from the database.
+        if self.version is None or version != self.version + 1:
+            return self.invalidate()
+
+        exercise_id = exercise.id if exercise is not None else removed_id
+        old = self.search.docs.get(exercise_id)
+        if old is not None:
+            for key in self.facet_keys(SimpleNamespace(category=old[2], muscle_category=old[3])):
+                ids = self.ids_by_facet[key]
+                del ids[bisect.bisect_left(ids, exercise_id)]
+            self.items.pop(exercise_id, None)
+            self.search.remove(exercise_id)
+
+        if exercise is not None:
+            for key in self.facet_keys(exercise):
+                bisect.insort(self.ids_by_facet.setdefault(key, []), exercise.id)
+            self.items[exercise.id] = self.response_model.model_validate(exercise).model_dump_json().encode()
+            self.search.add(exercise)
+
+        self.version = version
+
+    def page(self, after_id, limit, category=None, muscle_category=None):
+        ids = self.ids_by_facet.get((category, muscle_category), [])
+        start = bisect.bisect_right(ids, after_id) if after_id is not None else 0
+        page_ids = ids[start:start + limit + 1]
+        last_id = page_ids[limit - 1] if len(page_ids) > limit else None
+        return [self.items[exercise_id] for exercise_id in page_ids[:limit]], last_id
+
+    async def load(self, db):
+        if self.version is not None and time.monotonic() - self.checked_at < CATALOG_CHECK_INTERVAL:
+            return self
+
+        version = await db.scalar(select(CatalogVersion.version)) or 0
+        if version != self.version:
+            async with self.lock:
+                if version != self.version:
+                    exercises = (await db.scalars(select(Exercise).order_by(Exercise.id))).all()
+                    self.items = {
+                        exercise.id: self.response_model.model_validate(exercise).model_dump_json().encode()
+                        for exercise in exercises
+                    }
+                    self.ids_by_facet = self.build_facets(exercises)
+                    # Off the event loop: a big catalog takes a while to index.
+                    self.search = await asyncio.to_thread(SearchIndex.build, exercises)
+                    self.version = version
+
+        self.checked_at = time.monotonic()
+        return self
@@ -1,14 +1,165 @@
-import os
+import time
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from fastapi import Depends
+from typing import Annotated
+from settings import getenv
 
-load_dotenv()
+DATABASE_URL = getenv("DATABASE_URL")
+READ_DATABASE_URL = getenv("READ_DATABASE_URL")
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = getenv("DB_POOL_PRE_PING", "true").lower() == "true"
 
-engine = create_engine(DATABASE_URL)
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+def dialect_insert(dialect_name: str):
+    # The dialect's own insert(), which carries its upsert clauses.
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+class PoolStats:
+    def __init__(self, name):
+        self.name = name
+        self.engine = None
+        self.checkouts = 0
+        self.saturated = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+
+
+class TimedPoolMixin:
+    # Times every checkout, and counts the ones that found every pooled
+    # and overflow connection already in use and had to queue.
+    stats = None
+
+    def _do_get(self):
+        if self._max_overflow >= 0 and self.checkedout() >= self.size() + self._max_overflow:
+            self.stats.saturated += 1
+        
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.checkouts += 1
+            self.stats.wait_time += time.perf_counter() - started
+
+
+pool_stats = []
+
+def pool_options(url, poolclass, name):
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}, None
+    
+    stats = PoolStats(name)
+    pool_stats.append(stats)
+    # A subclass per engine so the stats survive the pool being recreated
+    # on dispose().
+    timed_pool = type(f"Timed{poolclass.__name__}", (TimedPoolMixin, poolclass), {"stats": stats})
+    return {
+        "poolclass": timed_pool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }, stats
+
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def make_engine(url, name, is_async=True):
+    options, stats = pool_options(url, AsyncAdaptedQueuePool if is_async else QueuePool, name)
+    new_engine = create_async_engine(url, **options) if is_async else create_engine(url, **options)
+    if stats:
+        stats.engine = new_engine
+    # SQLite ignores foreign keys, ON DELETE CASCADE included, unless each
+    # connection asks for them.
+    if make_url(url).get_backend_name() == "sqlite":
+        event.listen(new_engine.sync_engine if is_async else new_engine, "connect", enable_sqlite_foreign_keys)
+    return new_engine
+
+
+ASYNC_DATABASE_URL = getenv("ASYNC_DATABASE_URL") or get_async_url(DATABASE_URL)
+
+engine = make_engine(DATABASE_URL, "sync", is_async=False)
+async_engine = make_engine(ASYNC_DATABASE_URL, "primary")
+
+# Read-only endpoints go to the replica when one is configured; without
+# one they share the primary engine and its pool.
+if READ_DATABASE_URL:
+    ASYNC_READ_DATABASE_URL = getenv("ASYNC_READ_DATABASE_URL") or get_async_url(READ_DATABASE_URL)
+    async_read_engine = make_engine(ASYNC_READ_DATABASE_URL, "replica")
+else:
+    async_read_engine = async_engine
 
 SessionLocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession,
+                                       autoflush=False, expire_on_commit=False)
+# Read sessions run in autocommit so a GET does not pay for BEGIN and
+# ROLLBACK round trips around its SELECTs.
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine.execution_options(isolation_level="AUTOCOMMIT"),
+                                           class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+Base = declarative_base()
+
+
+# The session only checks a connection out of the pool on its first
+# query, so requests rejected before touching the database (401, 403,
+# validation errors) never hold one. Handlers flush; the commit, or the
+# rollback if the handler raised, happens here once the handler returns
+# and before the response goes out.
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            if db.in_transaction():
+                await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    
+    for callback in db.info.get("after_commit", []):
+        callback()
+
+async def get_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+def after_commit(db, callback):
+    # For in-process state (caches, revocation sets) that must only change
+    # once the write is durable.
+    db.info.setdefault("after_commit", []).append(callback)
+
 
-Base = declarative_base()
\ No newline at end of file
+db_dependency = Annotated[AsyncSession, Depends(get_db, scope="function")]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db, scope="function")]
@@ -0,0 +1,10 @@
+def matches(header, etag, weak=True):
+    # If-None-Match compares weakly, ignoring W/ prefixes; If-Match
+    # needs the exact strong tag.
+    if not header:
+        return False
+    
+    tags = [tag.strip() for tag in header.split(",")]
+    if weak:
+        tags = [tag.removeprefix("W/") for tag in tags]
+    return "*" in tags or etag in tags
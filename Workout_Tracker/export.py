@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select, type_coerce, String
+from models import Workout_Plan, Workout_Exercises, Exercise
+from database import AsyncReadSessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def raw(column):
+    # Enum columns come back as the stored string instead of going through
+    # the enum lookup for every value; member names and values are the
+    # same for all enums in models.py.
+    return type_coerce(column, String)
+
+EXPORT_COLUMNS = {
+    "plan_id": Workout_Plan.id,
+    "schedule": Workout_Plan.schedule,
+    "status": raw(Workout_Plan.status),
+    "workout_exercise_id": Workout_Exercises.id,
+    "exercise_id": Exercise.id,
+    "exercise_name": Exercise.name,
+    "category": raw(Exercise.category),
+    "muscle_category": raw(Exercise.muscle_category),
+    "sets": Workout_Exercises.sets,
+    "reps": Workout_Exercises.reps,
+    "weight": Workout_Exercises.weight,
+}
+
+
+def history_query(user_id: int):
+    # One row per workout exercise; plans without exercises still get a
+    # row with the exercise columns empty.
+    return select(*EXPORT_COLUMNS.values())\
+        .select_from(Workout_Plan)\
+        .outerjoin(Workout_Plan.workout_exercise)\
+        .outerjoin(Workout_Exercises.exercise)\
+        .filter(Workout_Plan.user_id == user_id)\
+        .order_by(Workout_Plan.id, Workout_Exercises.id)\
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+def ndjson_chunk(rows):
+    return "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=datetime.isoformat) + "\n"
+                   for row in rows).encode()
+
+def csv_chunk(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_history(user_id: int, export_format: str):
+    # The request's session is closed by the time the body is sent, so
+    # the stream holds its own connection for as long as it runs. Rows
+    # come off a server-side cursor one batch at a time and each batch is
+    # sent as it is encoded, so memory does not grow with the history
+    # and the first bytes go out before the last rows are read.
+    if export_format == "csv":
+        yield csv_chunk([], header=True)
+
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(history_query(user_id))
+        async for rows in result.partitions():
+            yield ndjson_chunk(rows) if export_format == "ndjson" else csv_chunk(rows)
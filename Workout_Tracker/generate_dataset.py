@@ -0,0 +1,150 @@
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from models import Users, Exercise, Workout_Plan, Workout_Exercises, CategoryEnum, MuscleGroupEnum, StatusEnum
+from database import SessionLocal
+from security import bcrypt_context
+from seed_exercises import exercise_data, upsert_exercises
+import rollups
+import records
+
+# Rough working weights (kg) for an average lifter, per muscle group.
+BASE_WEIGHT = {
+    MuscleGroupEnum.legs: 80.0,
+    MuscleGroupEnum.back: 70.0,
+    MuscleGroupEnum.chest: 60.0,
+    MuscleGroupEnum.shoulders: 35.0,
+    MuscleGroupEnum.hands: 15.0,
+}
+
+
+class BatchWriter:
+    # Buffers rows per table and writes them with executemany in batches.
+    # Tables are flushed parents-first so foreign keys always resolve.
+    def __init__(self, db: Session, batch_size: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.buffers = {Users: [], Workout_Plan: [], Workout_Exercises: []}
+        self.written = {model: 0 for model in self.buffers}
+
+    def add(self, model, row):
+        buffer = self.buffers[model]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, upto=Workout_Exercises):
+        for model, buffer in self.buffers.items():
+            if buffer:
+                self.db.execute(insert(model), buffer)
+                self.written[model] += len(buffer)
+                buffer.clear()
+            if model is upto:
+                break
+        if upto is Workout_Exercises:
+            self.db.commit()
+
+
+def synthetic_exercises(count: int, rng: random.Random):
+    for number in range(1, count + 1):
+        base = rng.choice(exercise_data)
+        yield dict(base, name=f"{base['name']} variation {number}")
+
+
+def next_id(db: Session, model):
+    return (db.scalar(select(func.max(model.id))) or 0) + 1
+
+def sync_sequences(db: Session):
+    # Ids are written explicitly, which doesn't move Postgres' SERIAL
+    # sequences; without this the app's next insert would reuse an id.
+    # MySQL and SQLite pick up from the highest id on their own.
+    if db.bind.dialect.name != "postgresql":
+        return
+    for model in (Users, Workout_Plan, Workout_Exercises):
+        db.execute(select(func.setval(func.pg_get_serial_sequence(model.__tablename__, "id"), func.max(model.id))))
+    db.commit()
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    db: Session = SessionLocal()
+
+    upsert_exercises(db, exercise_data)
+    upsert_exercises(db, synthetic_exercises(args.exercises, rng))
+    db.commit()
+
+    catalog = db.execute(select(Exercise.id, Exercise.category, Exercise.muscle_category)
+                         .order_by(Exercise.id)).all()
+    # A few staples get most of the use, the long tail is picked rarely.
+    popularity = [1 / (rank + 1) for rank in range(len(catalog))]
+
+    hashed_password = bcrypt_context.hash("password")
+    user_id, plan_id, workout_exercise_id = (next_id(db, Users), next_id(db, Workout_Plan),
+                                             next_id(db, Workout_Exercises))
+    now = datetime.now().replace(second=0, microsecond=0)
+    writer = BatchWriter(db, args.batch_size)
+    started = time.perf_counter()
+
+    for _ in range(args.users):
+        writer.add(Users, {"id": user_id, "username": f"user{user_id}", "hashed_password": hashed_password,
+                           "is_active": True, "is_admin": False})
+        strength = rng.lognormvariate(0, 0.35)
+        # Most people log a handful of workouts, a few log hundreds.
+        plan_count = int(rng.lognormvariate(math.log(args.plans_per_user), 0.9))
+
+        for _ in range(plan_count):
+            age = rng.random()
+            schedule = now - timedelta(days=age * args.days) + timedelta(days=rng.uniform(0, 0.1) * args.days)
+            schedule = schedule.replace(hour=rng.randint(6, 21), minute=rng.choice((0, 15, 30, 45)))
+            if schedule > now:
+                plan_status = StatusEnum.pending
+            else:
+                plan_status = rng.choices((StatusEnum.completed, StatusEnum.skipped, StatusEnum.pending),
+                                          weights=(75, 15, 10))[0]
+            writer.add(Workout_Plan, {"id": plan_id, "user_id": user_id, "schedule": schedule,
+                                      "status": plan_status})
+            # Later sessions are heavier: up to 25% progression over the window.
+            progression = 1 + 0.25 * (1 - age)
+
+            for exercise_id, category, muscle_category in rng.choices(catalog, popularity, k=rng.randint(3, 8)):
+                if category == CategoryEnum.strength:
+                    sets, reps = rng.randint(3, 5), rng.choice((5, 6, 8, 10, 12))
+                    weight = round(BASE_WEIGHT[muscle_category] * strength * progression / 2.5) * 2.5
+                else:
+                    sets, reps, weight = rng.randint(1, 3), rng.randint(1, 20), 0.0
+                writer.add(Workout_Exercises, {"id": workout_exercise_id, "workout_plan_id": plan_id,
+                                               "exercise_id": exercise_id, "sets": sets, "reps": reps,
+                                               "weight": weight})
+                workout_exercise_id += 1
+            plan_id += 1
+        user_id += 1
+
+    writer.flush()
+    sync_sequences(db)
+    # The rows went in around the app's write paths, so the weekly volume
+    # rollups and personal records are built from them in one pass instead.
+    rollups.rebuild(db)
+    records.rebuild(db)
+    db.commit()
+    db.close()
+
+    elapsed = time.perf_counter() - started
+    total = sum(writer.written.values())
+    print(f"Generated {writer.written[Users]} users, {writer.written[Workout_Plan]} plans and "
+          f"{writer.written[Workout_Exercises]} workout exercises in {elapsed:.1f}s "
+          f"({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the database with a reproducible synthetic dataset.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--plans-per-user", type=float, default=20, help="median plans per user")
+    parser.add_argument("--exercises", type=int, default=0, help="extra synthetic catalog exercises")
+    parser.add_argument("--days", type=int, default=365, help="history window")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    generate(parser.parse_args())
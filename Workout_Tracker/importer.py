@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import csv
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, insert
+from models import Workout_Plan, Workout_Exercises, Exercise, StatusEnum
+from database import AsyncSessionLocal
+from rollups import week_start, increment_statement
+from records import add_records
+
+# Rows per transaction. A failure part way through a file leaves the
+# chunks before it committed; the summary says how far it got.
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+READ_SIZE = 1 << 20
+
+EXERCISE_COLUMNS = ("workout_plan_id", "exercise_id", "sets", "reps", "weight")
+
+
+async def read_lines(chunks):
+    # Splits a stream of byte chunks into batches of complete lines.
+    pending = b""
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        if lines:
+            yield [line.decode() for line in lines]
+    if pending.strip():
+        yield [pending.decode()]
+
+async def file_chunks(path: str):
+    with open(path, "rb") as source:
+        while chunk := source.read(READ_SIZE):
+            yield chunk
+
+async def parse_records(chunks, import_format: str):
+    # Yields (line number, record or error message) so a broken line is
+    # reported and skipped instead of failing the whole file.
+    number = 0
+    header = None
+    async for lines in read_lines(chunks):
+        if import_format == "csv":
+            rows = csv.reader(lines)
+            if header is None:
+                header = next(rows, None)
+                number += 1
+            for row in rows:
+                number += 1
+                if not row:
+                    continue
+                if len(row) != len(header):
+                    yield number, f"Expected {len(header)} columns, got {len(row)}"
+                    continue
+                yield number, dict(zip(header, row))
+        else:
+            for line in lines:
+                number += 1
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    yield number, "Invalid JSON"
+                    continue
+                yield number, record if isinstance(record, dict) else "Expected a JSON object"
+
+
+def present(value):
+    return value not in (None, "")
+
+def plan_key(record):
+    # Rows of the same workout share the source's plan_id; files without
+    # one get a plan per distinct schedule and status. Raw values, so rows
+    # of a plan that was already seen skip parsing.
+    key = record.get("plan_id")
+    return str(key) if present(key) else (str(record.get("schedule")), str(record.get("status")))
+
+def parse_plan(record):
+    schedule = record.get("schedule")
+    try:
+        schedule = datetime.fromisoformat(schedule) if present(schedule) else None
+    except (TypeError, ValueError):
+        raise ValueError("schedule should be an ISO 8601 date and time")
+
+    plan_status = record.get("status")
+    try:
+        plan_status = StatusEnum(plan_status) if present(plan_status) else StatusEnum.completed
+    except ValueError:
+        raise ValueError(f"status should be one of {', '.join(member.value for member in StatusEnum)}")
+
+    return {"schedule": schedule, "status": plan_status}
+
+def parse_entry(record, catalog):
+    name = record.get("exercise_name")
+    if not present(name):
+        return None
+    if name not in catalog:
+        raise ValueError(f"Exercise '{name}' not found")
+
+    try:
+        entry = {"exercise_id": catalog[name].id, "sets": int(record.get("sets")),
+                 "reps": int(record.get("reps")), "weight": float(record.get("weight"))}
+    except (TypeError, ValueError):
+        raise ValueError("sets and reps should be integers and weight a number")
+    if entry["sets"] < 0 or entry["reps"] < 0 or entry["weight"] < 0:
+        raise ValueError("sets, reps and weight can not be negative")
+    return entry
+
+
+async def insert_plans(db, rows):
+    dialect = db.bind.dialect
+
+    if dialect.name == "sqlite":
+        # One writer at a time and rowids handed out in VALUES order, so the
+        # sorted ids line up with the rows; asking SQLAlchemy for that
+        # guarantee would make it insert them one by one.
+        return sorted((await db.scalars(insert(Workout_Plan).returning(Workout_Plan.id), rows)).all())
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        return (await db.scalars(insert(Workout_Plan).returning(Workout_Plan.id, sort_by_parameter_order=True),
+                                 rows)).all()
+
+    # No RETURNING on MySQL: the ORM fetches each new id as it inserts.
+    plans = [Workout_Plan(**row) for row in rows]
+    db.add_all(plans)
+    await db.flush()
+    return [plan.id for plan in plans]
+
+async def insert_exercises(db, rows):
+    if db.bind.dialect.driver == "asyncpg":
+        connection = await (await db.connection()).get_raw_connection()
+        await connection.driver_connection.copy_records_to_table(
+            Workout_Exercises.__tablename__, columns=EXERCISE_COLUMNS,
+            records=[tuple(row[column] for column in EXERCISE_COLUMNS) for row in rows])
+    else:
+        # The table rather than the entity: a plain executemany without the
+        # ORM's per-row bookkeeping.
+        await db.execute(insert(Workout_Exercises.__table__), rows)
+
+
+class Importer:
+    # Buffers parsed rows and writes them a chunk at a time: the chunk's
+    # new plans in one multi-row insert, then its exercises, then its
+    # weekly volume and personal records, then a commit.
+    def __init__(self, db, user_id: int, catalog):
+        self.db = db
+        self.user_id = user_id
+        self.catalog = catalog
+        self.catalog_by_id = {exercise.id: exercise for exercise in catalog.values()}
+        self.plan_ids = {}
+        self.plan_weeks = {}
+        self.completed = set()
+        self.new_plans = {}
+        self.entries = []
+        self.plan_count = 0
+        self.exercise_count = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": number, "error": message})
+
+    async def add(self, number, record):
+        if isinstance(record, str):
+            return self.error(number, record)
+        key = plan_key(record)
+        try:
+            plan = parse_plan(record) if key not in self.plan_ids and key not in self.new_plans else None
+            entry = parse_entry(record, self.catalog)
+        except ValueError as exc:
+            return self.error(number, str(exc))
+
+        if plan:
+            self.new_plans[key] = plan
+        if entry:
+            self.entries.append((key, entry))
+
+        if len(self.new_plans) + len(self.entries) >= IMPORT_CHUNK_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        if self.new_plans:
+            rows = [dict(plan, user_id=self.user_id) for plan in self.new_plans.values()]
+            for (key, plan), plan_id in zip(self.new_plans.items(), await insert_plans(self.db, rows)):
+                self.plan_ids[key] = plan_id
+                if plan["status"] == StatusEnum.completed:
+                    self.completed.add(key)
+                if plan["status"] == StatusEnum.completed and plan["schedule"] is not None:
+                    self.plan_weeks[key] = week_start(plan["schedule"])
+            self.plan_count += len(rows)
+
+        if self.entries:
+            await insert_exercises(self.db, [dict(entry, workout_plan_id=self.plan_ids[key])
+                                             for key, entry in self.entries])
+            self.exercise_count += len(self.entries)
+            await self.add_volume()
+            await add_records(self.db, self.user_id, [(entry["exercise_id"], entry["reps"], entry["weight"])
+                                                      for key, entry in self.entries if key in self.completed])
+
+        await self.db.commit()
+        self.db.expunge_all()
+        self.new_plans.clear()
+        self.entries.clear()
+
+    async def add_volume(self):
+        # Imported plans bypass the endpoints that keep weekly_volume up to
+        # date, so each chunk adds its completed workouts in one upsert.
+        by_exercise = defaultdict(lambda: [0, 0.0])
+        for key, entry in self.entries:
+            week = self.plan_weeks.get(key)
+            if week is not None:
+                total = by_exercise[week, entry["exercise_id"]]
+                total[0] += entry["sets"]
+                total[1] += entry["sets"] * entry["reps"] * entry["weight"]
+
+        totals = defaultdict(lambda: [0, 0.0])
+        for (week, exercise_id), (sets, volume) in by_exercise.items():
+            exercise = self.catalog_by_id[exercise_id]
+            total = totals[week, exercise.muscle_category, exercise.category]
+            total[0] += sets
+            total[1] += volume
+
+        rows = [{"user_id": self.user_id, "week_start": week, "muscle_category": muscle_category,
+                 "category": category, "sets": sets, "volume": volume}
+                for (week, muscle_category, category), (sets, volume) in totals.items()]
+        if rows:
+            await self.db.execute(increment_statement(self.db.bind.dialect.name), rows)
+
+    def summary(self):
+        return {"plans": self.plan_count, "exercises": self.exercise_count,
+                "error_count": self.error_count, "errors": self.errors}
+
+
+async def load_catalog(db):
+    # One query for the whole import; names are resolved from this map.
+    result = await db.execute(select(Exercise.id, Exercise.name, Exercise.category, Exercise.muscle_category))
+    return {exercise.name: exercise for exercise in result}
+
+async def import_history(user_id: int, chunks, import_format: str):
+    async with AsyncSessionLocal() as db:
+        importer = Importer(db, user_id, await load_catalog(db))
+        async for number, record in parse_records(chunks, import_format):
+            await importer.add(number, record)
+        await importer.flush()
+        return importer.summary()
+
+
+async def main(args):
+    import_format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    started = time.perf_counter()
+    summary = await import_history(args.user_id, file_chunks(args.path), import_format)
+    elapsed = time.perf_counter() - started
+    print(f"Imported {summary['plans']} plans and {summary['exercises']} workout exercises in {elapsed:.1f}s, "
+          f"{summary['error_count']} rows rejected")
+    for error in summary["errors"]:
+        print(f"  row {error['row']}: {error['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import workout history from a CSV or NDJSON export.")
+    parser.add_argument("path")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="defaults to the file extension")
+    asyncio.run(main(parser.parse_args()))
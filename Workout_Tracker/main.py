@@ -1,13 +1,47 @@
+import startup
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from models import Users, Workout_Exercises, Workout_Plan, Exercise
-from database import Base, engine
-from routers import exercise, auth, workout_plan, wourkout_exercise
+from database import async_engine, async_read_engine
+from routers import exercise, auth, workout_plan, wourkout_exercise, analytics
+import metrics
+import scheduler
 
-app = FastAPI()
 
-Base.metadata.create_all(bind=engine)
+# The schema is created and upgraded by `alembic upgrade head`, run once
+# per deploy before the workers start. Workers never run DDL, so they
+# boot without touching the database and don't race each other for it.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweeps = asyncio.create_task(scheduler.run_overdue_sweeps()) if scheduler.OVERDUE_SWEEP_INTERVAL > 0 else None
+    startup.ready()
+    yield
+    if sweeps:
+        sweeps.cancel()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(exercise.router)
 app.include_router(auth.router)
 app.include_router(workout_plan.router)
-app.include_router(wourkout_exercise.router)
\ No newline at end of file
+app.include_router(wourkout_exercise.router)
+app.include_router(analytics.router)
+
+# Nothing is hooked in unless metrics are switched on, so a disabled
+# deployment pays nothing for them.
+if metrics.METRICS_ENABLED:
+    from routers import metrics as metrics_router
+    
+    metrics.instrument_engine(async_engine.sync_engine)
+    if async_read_engine is not async_engine:
+        metrics.instrument_engine(async_read_engine.sync_engine)
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(metrics_router.router)
+
+app.add_middleware(startup.FirstRequestTimer)
+
+startup.imported()
@@ -0,0 +1,173 @@
+import time
+import logging
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from sqlalchemy import event
+import database
+import startup
+import admission
+from settings import getenv
+
+METRICS_ENABLED = getenv("METRICS_ENABLED", "false").lower() == "true"
+SERVER_TIMING = getenv("SERVER_TIMING", "false").lower() == "true"
+SLOW_REQUEST_MS = float(getenv("SLOW_REQUEST_MS", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_logger = logging.getLogger("workout_tracker.slow_requests")
+current_request = ContextVar("current_request", default=None)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_time", "sql")
+
+    def __init__(self, keep_sql: bool):
+        self.statements = 0
+        self.db_time = 0.0
+        self.sql = [] if keep_sql else None
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.latency = defaultdict(Histogram)
+        self.requests = defaultdict(int)
+        self.statements = defaultdict(int)
+        self.db_time = defaultdict(float)
+
+    def record(self, method: str, route: str, status_code: int, elapsed: float, stats: RequestStats):
+        key = (method, route)
+        self.latency[key].observe(elapsed)
+        self.requests[(method, route, str(status_code))] += 1
+        self.statements[key] += stats.statements
+        self.db_time[key] += stats.db_time
+
+    def render(self):
+        lines = ["# TYPE http_request_duration_seconds histogram"]
+        for (method, route), histogram in sorted(self.latency.items()):
+            labels = f'method="{method}",route="{route}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram.total}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+        lines.append("# TYPE http_requests_total counter")
+        for (method, route, status_code), count in sorted(self.requests.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status_code}"}} {count}')
+
+        lines.append("# TYPE db_statements_total counter")
+        for (method, route), count in sorted(self.statements.items()):
+            lines.append(f'db_statements_total{{method="{method}",route="{route}"}} {count}')
+
+        lines.append("# TYPE db_duration_seconds_total counter")
+        for (method, route), total in sorted(self.db_time.items()):
+            lines.append(f'db_duration_seconds_total{{method="{method}",route="{route}"}} {total}')
+
+        lines.append("# TYPE app_startup_seconds gauge")
+        for phase, seconds in startup.timings.items():
+            lines.append(f'app_startup_seconds{{phase="{phase}"}} {seconds}')
+
+        lines.extend(render_pool_stats())
+        lines.extend(admission.render_admission_stats())
+        return "\n".join(lines) + "\n"
+
+
+def render_pool_stats():
+    counters = (
+        ("db_pool_checkouts_total", "counter", lambda stats: stats.checkouts),
+        ("db_pool_checkout_wait_seconds_total", "counter", lambda stats: stats.wait_time),
+        ("db_pool_saturated_checkouts_total", "counter", lambda stats: stats.saturated),
+        ("db_pool_timeouts_total", "counter", lambda stats: stats.timeouts),
+        ("db_pool_checked_out", "gauge", lambda stats: stats.engine.pool.checkedout()),
+        ("db_pool_size", "gauge", lambda stats: stats.engine.pool.size()),
+    )
+    lines = []
+    for name, kind, value in counters:
+        lines.append(f"# TYPE {name} {kind}")
+        for stats in database.pool_stats:
+            lines.append(f'{name}{{pool="{stats.name}"}} {value(stats)}')
+    return lines
+
+
+registry = Registry()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is None:
+        return
+    
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats.statements += 1
+    stats.db_time += elapsed
+    if stats.sql is not None:
+        stats.sql.append((elapsed, statement))
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task or body
+    # buffering per request, just a wrapped send.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(keep_sql=SLOW_REQUEST_MS > 0)
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SERVER_TIMING:
+                    elapsed = (time.perf_counter() - started) * 1000
+                    timing = (f'db;dur={stats.db_time * 1000:.2f};desc="{stats.statements} queries", '
+                              f'app;dur={elapsed:.2f}')
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            registry.record(scope["method"], route_path, status_code, elapsed, stats)
+
+            if stats.sql is not None and elapsed * 1000 >= SLOW_REQUEST_MS:
+                queries = "".join(f"\n  {duration * 1000:8.2f} ms  {' '.join(sql.split())}"
+                                  for duration, sql in stats.sql)
+                slow_logger.warning("%s %s took %.1f ms, %d queries, %.1f ms in the database%s",
+                                    scope["method"], scope["path"], elapsed * 1000,
+                                    stats.statements, stats.db_time * 1000, queries)
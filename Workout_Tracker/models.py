@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Enum, Integer, String, ForeignKey, Boolean, Float, DateTime
+from sqlalchemy import Column, Enum, Integer, String, ForeignKey, Boolean, Float, DateTime, Date, Index
 from database import Base
 from sqlalchemy.orm import relationship
 
@@ -15,6 +15,11 @@ class Users(Base):
     
     workout_plan = relationship("Workout_Plan", back_populates="user")
     
+    __table_args__ = (
+        # Every worker re-reads the deactivated users every few seconds.
+        Index('ix_users_is_active', 'is_active'),
+    )
+    
 class MuscleGroupEnum(enum.Enum):
     chest = 'chest'
     back = 'back'
@@ -41,7 +46,10 @@ class Exercise(Base):
     category = Column(Enum(CategoryEnum), nullable=False)
     muscle_category = Column(Enum(MuscleGroupEnum), nullable=False)
     
-    workout_exercise = relationship("Workout_Exercises", back_populates="exercise", cascade="all, delete-orphan")
+    # The database removes an exercise's workout entries itself (ON DELETE
+    # CASCADE), so deleting one is a single statement, never a load.
+    workout_exercise = relationship("Workout_Exercises", back_populates="exercise", cascade="all, delete-orphan",
+                                    passive_deletes=True)
     
 class Workout_Plan(Base):
     __tablename__ = 'workout_plan'
@@ -50,19 +58,89 @@ class Workout_Plan(Base):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     schedule = Column(DateTime, nullable=True)
     status = Column(Enum(StatusEnum), nullable=False, default=StatusEnum.pending)
+    # Bumped by every change to the plan or its exercises; the ETag of
+    # the plan and of any page it is on is built from it.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
-    workout_exercise = relationship("Workout_Exercises", back_populates="workout_plan")
+    workout_exercise = relationship("Workout_Exercises", back_populates="workout_plan", cascade="all, delete-orphan",
+                                    passive_deletes=True)
     user = relationship("Users", back_populates="workout_plan")
     
+    __table_args__ = (
+        # Keyset pages walk a user's plans in id order.
+        Index('ix_workout_plan_user_id_id', 'user_id', 'id'),
+        Index('ix_workout_plan_user_id_schedule', 'user_id', 'schedule'),
+        Index('ix_workout_plan_user_id_status', 'user_id', 'status'),
+        Index('ix_workout_plan_status_schedule', 'status', 'schedule'),
+    )
+    
 class Workout_Exercises(Base):
     __tablename__ = 'workout_exercises'
     
     id = Column(Integer, primary_key=True)
-    workout_plan_id = Column(Integer, ForeignKey('workout_plan.id'), nullable=False)
-    exercise_id = Column(Integer, ForeignKey('exercises.id'), nullable=False)
+    workout_plan_id = Column(Integer, ForeignKey('workout_plan.id', ondelete='CASCADE'), nullable=False)
+    exercise_id = Column(Integer, ForeignKey('exercises.id', ondelete='CASCADE'), nullable=False)
     sets = Column(Integer, nullable=False)
     reps = Column(Integer, nullable=False)
     weight = Column(Float, nullable=False)
     
     workout_plan = relationship("Workout_Plan", back_populates="workout_exercise")
-    exercise = relationship("Exercise", back_populates="workout_exercise")
\ No newline at end of file
+    exercise = relationship("Exercise", back_populates="workout_exercise")
+    
+    __table_args__ = (
+        Index('ix_workout_exercises_workout_plan_id_exercise_id', 'workout_plan_id', 'exercise_id'),
+        # A plan's exercises are paged and exported in id order.
+        Index('ix_workout_exercises_workout_plan_id_id', 'workout_plan_id', 'id'),
+        Index('ix_workout_exercises_exercise_id', 'exercise_id'),
+    )
+    
+class CatalogVersion(Base):
+    __tablename__ = 'catalog_version'
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    
+class RevokedToken(Base):
+    __tablename__ = 'revoked_tokens'
+    
+    token_hash = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+class WeeklyVolume(Base):
+    __tablename__ = 'weekly_volume'
+    
+    # Sets and sets x reps x weight of completed plans, per Monday-based
+    # week. Kept up to date by the workout endpoints; rollups.py rebuilds it.
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    muscle_category = Column(Enum(MuscleGroupEnum), primary_key=True)
+    category = Column(Enum(CategoryEnum), primary_key=True)
+    sets = Column(Integer, nullable=False, default=0)
+    volume = Column(Float, nullable=False, default=0.0)
+    
+class PersonalRecord(Base):
+    __tablename__ = 'personal_records'
+    
+    # Best single-set numbers per user and exercise over completed plans.
+    # Kept up to date by the workout endpoints; records.py rebuilds it.
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    exercise_id = Column(Integer, ForeignKey('exercises.id', ondelete='CASCADE'), primary_key=True)
+    best_weight = Column(Float, nullable=False)
+    best_set_volume = Column(Float, nullable=False)
+    best_one_rep_max = Column(Float, nullable=False)
+    
+class Recommendation(Base):
+    __tablename__ = 'recommendations'
+    
+    # Suggested next session per user and exercise, written by the nightly
+    # `python recommendations.py` run from completed plans.
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    exercise_id = Column(Integer, ForeignKey('exercises.id', ondelete='CASCADE'), primary_key=True)
+    sets = Column(Integer, nullable=False)
+    reps = Column(Integer, nullable=False)
+    weight = Column(Float, nullable=False)
+    estimated_one_rep_max = Column(Float, nullable=False)
+    trend = Column(Float, nullable=False)
+    deload = Column(Boolean, nullable=False)
+    sessions = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
@@ -0,0 +1,75 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Annotated, Generic, List, Optional, TypeVar
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Largest id a BIGINT (and SQLite's INTEGER) can hold.
+MAX_ID = 2 ** 63 - 1
+
+limit_query = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+cursor_query = Annotated[Optional[str], Query()]
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+# Cursors are the last id of the previous page, plus its schedule when
+# the page is ordered by schedule, wrapped so clients treat them as opaque
+# and we can change what goes inside later.
+def encode_cursor(last_id: int, last_key: Optional[datetime] = None):
+    payload = {"id": last_id} if last_key is None else {"id": last_id, "key": last_key.isoformat()}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], with_key: bool = False):
+    if cursor is None:
+        return None
+    
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        last_id = payload["id"]
+        last_key = datetime.fromisoformat(payload["key"]) if with_key else None
+    except (binascii.Error, ValueError, KeyError, TypeError, OverflowError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # Anything else would only come from a hand-made cursor, and a float
+    # or an out of range int would otherwise reach the SQL as is.
+    if type(last_id) is not int or not 1 <= last_id <= MAX_ID:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return (last_key, last_id) if with_key else last_id
+
+def keyset_page(query, id_column, cursor: Optional[str], limit: int, key_column=None):
+    # Pages are in id order, or in (key_column, id) order so a range filter
+    # on an indexed key_column is read in index order instead of sorted.
+    if key_column is None:
+        after_id = decode_cursor(cursor)
+        if after_id is not None:
+            query = query.filter(id_column > after_id)
+        order = (id_column,)
+    else:
+        after = decode_cursor(cursor, with_key=True)
+        if after is not None:
+            query = query.filter(tuple_(key_column, id_column) > after)
+        order = (key_column, id_column)
+    
+    # One extra row tells us whether another page exists.
+    return query.order_by(*order).limit(limit + 1)
+
+def make_page(rows, limit: int, key: Optional[str] = None):
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.id, getattr(last, key) if key else None)
+    return {"items": rows[:limit], "next_cursor": next_cursor}
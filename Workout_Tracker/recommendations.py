@@ -0,0 +1,176 @@
+import argparse
+import time
+from itertools import chain
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.orm import Session
+from models import Recommendation, Users, Workout_Plan, Workout_Exercises, StatusEnum
+from database import SessionLocal
+from settings import getenv
+
+# Users per chunk of the nightly run; each chunk is one history query,
+# one pass of array maths and one transaction.
+RECOMMENDATION_CHUNK_USERS = int(getenv("RECOMMENDATION_CHUNK_USERS", "2000"))
+# How far back, and over how many of an exercise's latest sessions, the
+# trend is taken.
+RECOMMENDATION_LOOKBACK_DAYS = int(getenv("RECOMMENDATION_LOOKBACK_DAYS", "120"))
+RECOMMENDATION_SESSIONS = int(getenv("RECOMMENDATION_SESSIONS", "6"))
+
+# Double progression: add a rep each session until REP_CEILING, then add
+# weight and drop back to REP_FLOOR.
+REP_CEILING = 12
+REP_FLOOR = 8
+WEIGHT_STEP = 2.5
+WEIGHT_INCREMENT = 0.025
+# A deload is suggested once there are enough sessions to tell and the
+# estimated 1RM is falling by DELOAD_TREND a session, or the last session
+# was DELOAD_DROP under the best one; weight then comes off by DELOAD_CUT.
+DELOAD_MIN_SESSIONS = 3
+DELOAD_TREND = 0.02
+DELOAD_DROP = 0.1
+DELOAD_CUT = 0.1
+
+history_columns = (Workout_Plan.user_id, Workout_Exercises.exercise_id, Workout_Exercises.workout_plan_id,
+                   Workout_Exercises.sets, Workout_Exercises.reps, Workout_Exercises.weight)
+
+
+def group_ends(*keys):
+    # Index of the last element of each run of equal keys.
+    changed = np.zeros(len(keys[0]), dtype=bool)
+    changed[-1] = True
+    for key in keys:
+        changed[:-1] |= key[1:] != key[:-1]
+    return np.flatnonzero(changed)
+
+def round_weight(weight):
+    return np.maximum(np.round(weight / WEIGHT_STEP) * WEIGHT_STEP, 0.0)
+
+def recommend(user, exercise, plan, sets, reps, weight):
+    # Arrays are one element per workout exercise, ordered by user,
+    # exercise, schedule and plan. Returns arrays with one element per
+    # user and exercise; there is no Python loop over rows anywhere.
+    one_rep_max = weight * (1 + reps / 30.0)
+
+    # A session is one exercise in one plan; its top set is the row with
+    # the highest estimated 1RM.
+    session_ends = group_ends(user, exercise, plan)
+    session = np.repeat(np.arange(len(session_ends)), np.diff(session_ends, prepend=-1))
+    top = np.lexsort((one_rep_max, session))[session_ends]
+    user, exercise, sets, reps, weight, best = (column[top] for column in
+                                                 (user, exercise, sets, reps, weight, one_rep_max))
+
+    # Only each exercise's latest sessions count.
+    pair_ends = group_ends(user, exercise)
+    pair = np.repeat(np.arange(len(pair_ends)), np.diff(pair_ends, prepend=-1))
+    from_end = pair_ends[pair] - np.arange(len(pair))
+    recent = from_end < RECOMMENDATION_SESSIONS
+    pair, from_end, best = pair[recent], from_end[recent], best[recent]
+
+    # Least-squares slope of the estimated 1RM over session number, for
+    # every exercise at once from per-group sums.
+    count = np.bincount(pair)
+    x = (count[pair] - 1 - from_end).astype(np.float64)
+    sum_x, sum_y = np.bincount(pair, x), np.bincount(pair, best)
+    sum_xy, sum_xx = np.bincount(pair, x * best), np.bincount(pair, x * x)
+    spread = count * sum_xx - sum_x ** 2
+    slope = np.divide(count * sum_xy - sum_x * sum_y, spread, out=np.zeros(len(count)), where=spread > 0)
+    mean = sum_y / count
+    trend = np.divide(slope, mean, out=np.zeros(len(count)), where=mean > 0)
+
+    starts = np.flatnonzero(np.diff(pair, prepend=-1))
+    peak = np.maximum.reduceat(best, starts)
+    latest = best[starts + count - 1]
+    deload = (count >= DELOAD_MIN_SESSIONS) & ((trend <= -DELOAD_TREND) | (latest < peak * (1 - DELOAD_DROP)))
+
+    # The next session builds on the last one's top set.
+    last_sets, last_reps, last_weight = sets[pair_ends], reps[pair_ends], weight[pair_ends]
+    add_weight = (last_reps >= REP_CEILING) & (last_weight > 0)
+    heavier = np.maximum(round_weight(last_weight * (1 + WEIGHT_INCREMENT)), last_weight + WEIGHT_STEP)
+
+    return {
+        "user_id": user[pair_ends],
+        "exercise_id": exercise[pair_ends],
+        "sets": np.where(deload, np.maximum(last_sets - 1, 1), last_sets),
+        "reps": np.where(deload, last_reps, np.where(add_weight, REP_FLOOR, last_reps + 1)),
+        "weight": np.where(deload, round_weight(last_weight * (1 - DELOAD_CUT)),
+                           np.where(add_weight, heavier, last_weight)),
+        "estimated_one_rep_max": peak,
+        "trend": trend,
+        "deload": deload,
+        "sessions": count,
+    }
+
+
+def history_query(first_user: int, last_user: int, since: datetime):
+    return select(*history_columns)\
+        .select_from(Workout_Exercises)\
+        .join(Workout_Exercises.workout_plan)\
+        .filter(Workout_Plan.status == StatusEnum.completed)\
+        .filter(Workout_Plan.schedule >= since)\
+        .filter(Workout_Plan.user_id > first_user, Workout_Plan.user_id <= last_user)\
+        .order_by(Workout_Plan.user_id, Workout_Exercises.exercise_id, Workout_Plan.schedule,
+                  Workout_Exercises.workout_plan_id)
+
+def load_history(db: Session, first_user: int, last_user: int, since: datetime):
+    # The chunk comes back as one array per column rather than row objects.
+    # fromiter over the flattened rows; np.array on Row objects probes each
+    # one for the array protocol and is several times slower.
+    rows = db.execute(history_query(first_user, last_user, since)).all()
+    table = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * len(history_columns))\
+        .reshape(len(rows), len(history_columns))
+    user, exercise, plan, sets, reps, weight = table.T
+    return (user.astype(np.int64), exercise.astype(np.int64), plan.astype(np.int64),
+            sets.astype(np.int64), reps.astype(np.int64), weight)
+
+def user_ranges(db: Session):
+    # (after, up to) user id bounds of RECOMMENDATION_CHUNK_USERS users each.
+    last_user = 0
+    while True:
+        upper = db.scalar(select(Users.id).filter(Users.id > last_user).order_by(Users.id)
+                          .offset(RECOMMENDATION_CHUNK_USERS - 1).limit(1))
+        if upper is None:
+            upper = db.scalar(select(func.max(Users.id)).filter(Users.id > last_user))
+        if upper is None:
+            return
+        yield last_user, upper
+        last_user = upper
+
+def write_chunk(db: Session, first_user: int, last_user: int, columns, computed_at: datetime):
+    # The chunk's users are replaced wholesale, which also clears out
+    # exercises with no sessions left in the lookback.
+    db.execute(delete(Recommendation).filter(Recommendation.user_id > first_user,
+                                             Recommendation.user_id <= last_user))
+    names = list(columns)
+    rows = [dict(zip(names, values), computed_at=computed_at)
+            for values in zip(*(columns[name].tolist() for name in names))]
+    if rows:
+        db.execute(insert(Recommendation.__table__), rows)
+    return len(rows)
+
+def run(db: Session, now=None):
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    since = now - timedelta(days=RECOMMENDATION_LOOKBACK_DAYS)
+    read = written = 0
+    for first_user, last_user in user_ranges(db):
+        history = load_history(db, first_user, last_user, since)
+        read += len(history[0])
+        columns = recommend(*history) if len(history[0]) else {}
+        written += write_chunk(db, first_user, last_user, columns, now)
+        db.commit()
+    return read, written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute next-session recommendations for every user.")
+    parser.parse_args()
+
+    started = time.perf_counter()
+    db: Session = SessionLocal()
+    try:
+        read, written = run(db)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} recommendations from {read} workout exercises in {elapsed:.1f}s "
+          f"({read / elapsed:.0f} rows/s)")
@@ -0,0 +1,137 @@
+import argparse
+import time
+from collections import defaultdict
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.orm import Session
+from models import PersonalRecord, Workout_Plan, Workout_Exercises, StatusEnum
+from database import SessionLocal, dialect_insert
+
+REBUILD_BATCH_SIZE = 1000
+
+RECORD_COLUMNS = ("best_weight", "best_set_volume", "best_one_rep_max")
+
+set_volume = Workout_Exercises.reps * Workout_Exercises.weight
+# Epley's estimate of the one-rep max from a set of reps at a weight.
+one_rep_max = Workout_Exercises.weight * (1 + Workout_Exercises.reps / 30.0)
+
+
+def entry_record(reps: int, weight: float):
+    return {"best_weight": weight, "best_set_volume": reps * weight, "best_one_rep_max": weight * (1 + reps / 30)}
+
+def best_records(entries):
+    # entries are (exercise_id, reps, weight); one row per exercise.
+    records = {}
+    for exercise_id, reps, weight in entries:
+        record = entry_record(reps, weight)
+        best = records.setdefault(exercise_id, record)
+        for column in RECORD_COLUMNS:
+            best[column] = max(best[column], record[column])
+    return records
+
+def record_statement(dialect_name: str):
+    # An upsert that keeps whichever of the stored and new values is higher.
+    statement = dialect_insert(dialect_name)(PersonalRecord)
+    # SQLite's two-argument max() is its GREATEST.
+    greatest = func.max if dialect_name == "sqlite" else func.greatest
+
+    if dialect_name == "mysql":
+        return statement.on_duplicate_key_update(
+            {column: greatest(getattr(PersonalRecord, column), getattr(statement.inserted, column))
+             for column in RECORD_COLUMNS})
+
+    return statement.on_conflict_do_update(
+        index_elements=["user_id", "exercise_id"],
+        set_={column: greatest(getattr(PersonalRecord, column), getattr(statement.excluded, column))
+              for column in RECORD_COLUMNS})
+
+async def add_records(db, user_id: int, entries):
+    # One upsert per exercise touched, whatever the user's history holds.
+    rows = [dict(record, user_id=user_id, exercise_id=exercise_id)
+            for exercise_id, record in best_records(entries).items()]
+    if rows:
+        await db.execute(record_statement(db.bind.dialect.name), rows)
+
+
+def records_query(*filters):
+    return select(Workout_Plan.user_id, Workout_Exercises.exercise_id, func.max(Workout_Exercises.weight),
+                  func.max(set_volume), func.max(one_rep_max))\
+        .select_from(Workout_Exercises)\
+        .join(Workout_Exercises.workout_plan)\
+        .filter(Workout_Plan.status == StatusEnum.completed)\
+        .filter(*filters)\
+        .group_by(Workout_Plan.user_id, Workout_Exercises.exercise_id)
+
+def record_rows(result):
+    return [{"user_id": user_id, "exercise_id": exercise_id, "best_weight": weight,
+             "best_set_volume": volume, "best_one_rep_max": estimate}
+            for user_id, exercise_id, weight, volume, estimate in result]
+
+async def record_pairs(db, *filters):
+    # The (user, exercise) pairs that workout exercises matching filters
+    # count towards; taken before a delete so they can be recomputed after.
+    result = await db.execute(select(Workout_Plan.user_id, Workout_Exercises.exercise_id).distinct()
+                              .select_from(Workout_Exercises).join(Workout_Exercises.workout_plan)
+                              .filter(Workout_Plan.status == StatusEnum.completed).filter(*filters))
+    return [tuple(pair) for pair in result]
+
+async def recompute_records(db, pairs):
+    # Removing a set can lower a record, which no upsert can do, so the
+    # pairs it touched are worked out again from what is left. Grouped by
+    # user so the statements stay on the primary key rather than a
+    # row-value IN, which SQLite answers with a scan.
+    by_user = defaultdict(list)
+    for user_id, exercise_id in pairs:
+        by_user[user_id].append(exercise_id)
+
+    for user_id, exercise_ids in by_user.items():
+        for start in range(0, len(exercise_ids), REBUILD_BATCH_SIZE):
+            batch = exercise_ids[start:start + REBUILD_BATCH_SIZE]
+            rows = record_rows(await db.execute(records_query(Workout_Plan.user_id == user_id,
+                                                              Workout_Exercises.exercise_id.in_(batch))))
+            await db.execute(delete(PersonalRecord).filter(PersonalRecord.user_id == user_id)
+                             .filter(PersonalRecord.exercise_id.in_(batch))
+                             .execution_options(synchronize_session=False))
+            if rows:
+                await db.execute(insert(PersonalRecord), rows)
+
+async def remove_entry_record(db, user_id: int, exercise_id: int, reps: int, weight: float):
+    # A set that beat none of the stored records can go without a recount.
+    stored = await db.get(PersonalRecord, (user_id, exercise_id))
+    record = entry_record(reps, weight)
+    if stored is not None and any(record[column] >= getattr(stored, column) for column in RECORD_COLUMNS):
+        await recompute_records(db, [(user_id, exercise_id)])
+
+async def plan_entries(db, plan_id: int):
+    result = await db.execute(select(Workout_Exercises.exercise_id, Workout_Exercises.reps, Workout_Exercises.weight)
+                              .filter(Workout_Exercises.workout_plan_id == plan_id))
+    return result.all()
+
+
+def rebuild(db: Session, user_id=None):
+    query = records_query()
+    cleanup = delete(PersonalRecord)
+    if user_id is not None:
+        query = query.filter(Workout_Plan.user_id == user_id)
+        cleanup = cleanup.filter(PersonalRecord.user_id == user_id)
+
+    rows = record_rows(db.execute(query))
+    db.execute(cleanup)
+    for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+        db.execute(insert(PersonalRecord), rows[start:start + REBUILD_BATCH_SIZE])
+
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute personal records from workout history.")
+    parser.add_argument("--user-id", type=int, help="only rebuild this user's rows")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db: Session = SessionLocal()
+    try:
+        written = rebuild(db, args.user_id)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt personal records ({written} rows) in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,138 @@
+import argparse
+import time
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.orm import Session
+from models import WeeklyVolume, Workout_Plan, Workout_Exercises, Exercise, StatusEnum
+from database import SessionLocal, dialect_insert
+
+REBUILD_BATCH_SIZE = 1000
+
+entry_volume = Workout_Exercises.sets * Workout_Exercises.reps * Workout_Exercises.weight
+
+
+def week_start(day) -> date:
+    if isinstance(day, datetime):
+        day = day.date()
+    return day - timedelta(days=day.weekday())
+
+def counts_towards_volume(plan):
+    return plan.status == StatusEnum.completed and plan.schedule is not None
+
+def entry_totals(entries):
+    # entries are (exercise, workout exercise) pairs; anything with sets,
+    # reps and weight will do for the second one.
+    totals = defaultdict(lambda: [0, 0.0])
+    for exercise, entry in entries:
+        total = totals[exercise.muscle_category, exercise.category]
+        total[0] += entry.sets
+        total[1] += entry.sets * entry.reps * entry.weight
+    return totals
+
+def increment_statement(dialect_name: str):
+    statement = dialect_insert(dialect_name)(WeeklyVolume)
+
+    if dialect_name == "mysql":
+        return statement.on_duplicate_key_update(sets=WeeklyVolume.sets + statement.inserted.sets,
+                                                 volume=WeeklyVolume.volume + statement.inserted.volume)
+
+    return statement.on_conflict_do_update(
+        index_elements=["user_id", "week_start", "muscle_category", "category"],
+        set_={"sets": WeeklyVolume.sets + statement.excluded.sets,
+              "volume": WeeklyVolume.volume + statement.excluded.volume})
+
+async def add_volume(db, user_id: int, schedule: datetime, totals, sign: int = 1):
+    # One upsert per (muscle group, category) touched; the increment runs
+    # in the database so concurrent writers for the same week add up.
+    rows = [
+        {"user_id": user_id, "week_start": week_start(schedule), "muscle_category": muscle_category,
+         "category": category, "sets": sign * sets, "volume": sign * volume}
+        for (muscle_category, category), (sets, volume) in totals.items()
+    ]
+    if rows:
+        await db.execute(increment_statement(db.bind.dialect.name), rows)
+
+async def plan_totals(db, plan_id: int):
+    result = await db.execute(select(Exercise.muscle_category, Exercise.category,
+                                     func.sum(Workout_Exercises.sets), func.sum(entry_volume))
+                              .join(Workout_Exercises.exercise)
+                              .filter(Workout_Exercises.workout_plan_id == plan_id)
+                              .group_by(Exercise.muscle_category, Exercise.category))
+    return {(muscle_category, category): [int(sets), float(volume)]
+            for muscle_category, category, sets, volume in result}
+
+
+def volume_query(*filters):
+    # Aggregated per plan in SQL, bucketed into weeks in Python so the
+    # query stays portable across MySQL, Postgres and SQLite date functions.
+    return select(Workout_Plan.user_id, Workout_Plan.schedule, Exercise.muscle_category, Exercise.category,
+                  func.sum(Workout_Exercises.sets), func.sum(entry_volume))\
+        .select_from(Workout_Exercises)\
+        .join(Workout_Exercises.workout_plan)\
+        .join(Workout_Exercises.exercise)\
+        .filter(Workout_Plan.status == StatusEnum.completed)\
+        .filter(Workout_Plan.schedule.is_not(None))\
+        .filter(*filters)\
+        .group_by(Workout_Plan.id, Workout_Plan.user_id, Workout_Plan.schedule,
+                  Exercise.muscle_category, Exercise.category)\
+        .execution_options(yield_per=REBUILD_BATCH_SIZE)
+
+def add_to_weeks(totals, rows):
+    for plan_user_id, schedule, muscle_category, category, sets, volume in rows:
+        total = totals[plan_user_id, week_start(schedule), muscle_category, category]
+        total[0] += int(sets)
+        total[1] += float(volume)
+
+def week_rows(totals, sign: int = 1):
+    return [
+        {"user_id": key[0], "week_start": key[1], "muscle_category": key[2], "category": key[3],
+         "sets": sign * sets, "volume": sign * volume}
+        for key, (sets, volume) in totals.items()
+    ]
+
+async def add_matching_volume(db, *filters, sign: int = 1):
+    # Adds (or with sign=-1 takes out) the volume of every workout
+    # exercise matching filters, for set-based statements that change
+    # plans in the database without the rows ever reaching Python.
+    totals = defaultdict(lambda: [0, 0.0])
+    result = await db.stream(volume_query(*filters))
+    async for rows in result.partitions():
+        add_to_weeks(totals, rows)
+
+    rows = week_rows(totals, sign)
+    for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+        await db.execute(increment_statement(db.bind.dialect.name), rows[start:start + REBUILD_BATCH_SIZE])
+
+
+def rebuild(db: Session, user_id=None):
+    query = volume_query()
+    cleanup = delete(WeeklyVolume)
+    if user_id is not None:
+        query = query.filter(Workout_Plan.user_id == user_id)
+        cleanup = cleanup.filter(WeeklyVolume.user_id == user_id)
+
+    totals = defaultdict(lambda: [0, 0.0])
+    add_to_weeks(totals, db.execute(query))
+
+    rows = week_rows(totals)
+    db.execute(cleanup)
+    for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+        db.execute(insert(WeeklyVolume), rows[start:start + REBUILD_BATCH_SIZE])
+
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the weekly volume rollup from workout history.")
+    parser.add_argument("--user-id", type=int, help="only rebuild this user's rows")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db: Session = SessionLocal()
+    try:
+        written = rebuild(db, args.user_id)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt weekly volume ({written} rows) in {time.perf_counter() - started:.1f}s")
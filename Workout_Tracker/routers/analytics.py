@@ -0,0 +1,115 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette import status
+from typing import Annotated, List, Optional
+from database import read_db_dependency
+from sqlalchemy import select
+from models import WeeklyVolume, PersonalRecord, Recommendation, MuscleGroupEnum, CategoryEnum
+from pydantic import BaseModel
+from .auth import get_current_user
+from datetime import date, datetime, timedelta
+from rollups import week_start
+
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=['analytics']
+)
+
+MAX_WEEKS = 104
+
+class WeeklyVolumeResponce(BaseModel):
+    week_start: date
+    muscle_category: MuscleGroupEnum
+    category: CategoryEnum
+    sets: int
+    volume: float
+    
+    class Config:
+        from_attributes = True
+        
+class PersonalRecordResponce(BaseModel):
+    exercise_id: int
+    best_weight: float
+    best_set_volume: float
+    best_one_rep_max: float
+    
+    class Config:
+        from_attributes = True
+        
+class RecommendationResponce(BaseModel):
+    exercise_id: int
+    sets: int
+    reps: int
+    weight: float
+    estimated_one_rep_max: float
+    trend: float
+    deload: bool
+    sessions: int
+    computed_at: datetime
+    
+    class Config:
+        from_attributes = True
+        
+        
+user_dependency = Annotated[dict, Depends(get_current_user)]
+
+@router.get('/volume', status_code=status.HTTP_200_OK, response_model=List[WeeklyVolumeResponce])
+async def get_weekly_volume(user: user_dependency, db: read_db_dependency,
+                            weeks: Annotated[int, Query(ge=1, le=MAX_WEEKS)] = 12,
+                            until: Optional[date] = None,
+                            muscle_category: Optional[MuscleGroupEnum] = None,
+                            category: Optional[CategoryEnum] = None):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    # A primary key range scan over the rollup: cost grows with the weeks
+    # asked for, not with the user's history.
+    last_week = week_start(until or date.today())
+    query = select(WeeklyVolume.week_start, WeeklyVolume.muscle_category, WeeklyVolume.category,
+                   WeeklyVolume.sets, WeeklyVolume.volume).filter(WeeklyVolume.user_id == user.get('user_id'))\
+        .filter(WeeklyVolume.week_start > last_week - timedelta(weeks=weeks))\
+        .filter(WeeklyVolume.week_start <= last_week)\
+        .filter(WeeklyVolume.sets != 0)
+    
+    if muscle_category is not None:
+        query = query.filter(WeeklyVolume.muscle_category == muscle_category)
+    if category is not None:
+        query = query.filter(WeeklyVolume.category == category)
+    
+    query = query.order_by(WeeklyVolume.week_start, WeeklyVolume.muscle_category, WeeklyVolume.category)
+    
+    return (await db.execute(query)).all()
+
+@router.get('/records', status_code=status.HTTP_200_OK, response_model=List[PersonalRecordResponce])
+async def get_personal_records(user: user_dependency, db: read_db_dependency,
+                               exercise_id: Optional[int] = None):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    # Read straight off the personal_records primary key; nothing here
+    # looks at the workout history itself.
+    query = select(PersonalRecord.exercise_id, PersonalRecord.best_weight, PersonalRecord.best_set_volume,
+                   PersonalRecord.best_one_rep_max).filter(PersonalRecord.user_id == user.get('user_id'))
+    
+    if exercise_id is not None:
+        query = query.filter(PersonalRecord.exercise_id == exercise_id)
+    
+    return (await db.execute(query.order_by(PersonalRecord.exercise_id))).all()
+
+@router.get('/recommendations', status_code=status.HTTP_200_OK, response_model=List[RecommendationResponce])
+async def get_recommendations(user: user_dependency, db: read_db_dependency,
+                              exercise_id: Optional[int] = None):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    # Worked out by the nightly `python recommendations.py` run; this only
+    # reads its rows back.
+    query = select(Recommendation.exercise_id, Recommendation.sets, Recommendation.reps, Recommendation.weight,
+                   Recommendation.estimated_one_rep_max, Recommendation.trend, Recommendation.deload,
+                   Recommendation.sessions, Recommendation.computed_at)\
+        .filter(Recommendation.user_id == user.get('user_id'))
+    
+    if exercise_id is not None:
+        query = query.filter(Recommendation.exercise_id == exercise_id)
+    
+    return (await db.execute(query.order_by(Recommendation.exercise_id))).all()
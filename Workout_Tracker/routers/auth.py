@@ -1,26 +1,25 @@
-import os
 from datetime import timedelta, datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from fastapi.security import OAuth2PasswordRequestForm,OAuth2PasswordBearer
 from jose import jwt, JWTError
-from models import Users
-from passlib.context import CryptContext
+from models import Users, RevokedToken
 from typing import Annotated
 from starlette import status
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from dotenv import load_dotenv
-
-load_dotenv()
+from sqlalchemy import select, delete
+from database import db_dependency, after_commit, dialect_insert
+from security import hash_password, verify_password
+from token_cache import claims_cache, auth_state, token_hash
+from settings import getenv
+from admission import login_limiter, signup_limiter, check_login_rate
 
 router = APIRouter(
     prefix="/auth",
     tags=['auth']
 )
 
-SECRET_KEY = os.getenv('SECRET_KEY')
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
+SECRET_KEY = getenv('SECRET_KEY')
+ALGORITHM = getenv("ALGORITHM", "HS256")
 
 class Token(BaseModel):
     access_token: str
@@ -32,16 +31,22 @@ class CreateUserRequest(BaseModel):
     is_active: bool
     is_admin: bool = False
     
-def get_db():
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
+class UpdateUserActive(BaseModel):
+    is_active: bool
+    
+class UserResponce(BaseModel):
+    id: int
+    username: str
+    is_active: bool
+    is_admin: bool
+    
+    class Config:
+        from_attributes = True
+        
+class MessageResponce(BaseModel):
+    message: str
     
-db_dependency = Annotated[Session, Depends(get_db)]
 oauth_bearer = OAuth2PasswordBearer(tokenUrl="auth/token")
-bcrypt_context = CryptContext(schemes={'bcrypt'}, deprecated='auto')
 
 
 def create_access_token(username: str, user_id: int, is_admin: bool, expires_delta: timedelta):
@@ -56,58 +61,132 @@ def create_access_token(username: str, user_id: int, is_admin: bool, expires_del
     
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def user_authentification(username: str, password: str, db):
-    user = db.query(Users).filter(Users.username == username).first()
+async def user_authentification(username: str, password: str, db):
+    user = await db.scalar(select(Users).filter(Users.username == username))
     
-    if not user:
+    if not user or not user.is_active:
         return False
     
-    if not bcrypt_context.verify(password, user.hashed_password):
+    is_valid, new_hash = await verify_password(password, user.hashed_password)
+    
+    if not is_valid:
         return False
     
+    if new_hash:
+        user.hashed_password = new_hash
+    
     return user
     
-async def get_current_user(token: Annotated[str, Depends(oauth_bearer)]):
+def decode_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get('sub')
-        user_id: bool = payload.get('user_id')
-        is_admin: bool = payload.get('is_admin')
-        
-        if username is None or user_id is None:
-            raise HTTPException(status_code=401, detail="Authentication failed")
-        
-        return {"username": username, "user_id": user_id, "is_admin": is_admin}
-        
     except JWTError:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
-@router.post('/user', status_code=status.HTTP_201_CREATED)
+    username: str = payload.get('sub')
+    user_id: int = payload.get('user_id')
+    is_admin: bool = payload.get('is_admin')
+    
+    if username is None or user_id is None or payload.get('exp') is None:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    return {"username": username, "user_id": user_id, "is_admin": is_admin}, payload['exp']
+    
+async def get_current_user(token: Annotated[str, Depends(oauth_bearer)]):
+    # Hot clients send the same token over and over; after the first
+    # signature check their claims come straight from the cache.
+    key = token_hash(token)
+    user = claims_cache.get(key)
+    
+    if user is None:
+        user, expires_at = decode_token(token)
+        claims_cache.set(key, user, expires_at)
+    
+    await auth_state.ensure_fresh()
+    if auth_state.is_rejected(key, user['user_id']):
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    return user
+    
+async def login_rate_limit(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
+    check_login_rate(form_data.username, request.client.host if request.client else "")
+    
+@router.post('/user', status_code=status.HTTP_201_CREATED, response_model=UserResponce,
+             dependencies=[Depends(signup_limiter, scope="function")])
 async def create_user(user: CreateUserRequest, db: db_dependency):
+    existing_user = await db.scalar(select(Users).filter(Users.username == user.username))
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    
     new_user = Users(
         username = user.username,
-        hashed_password = bcrypt_context.hash(user.password),
+        hashed_password = await hash_password(user.password),
         is_active = True,
         is_admin = user.is_admin
     )
     
-    existing_user = db.query(Users).filter(Users.username == user.username).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already exists")
-    
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.flush()
+    await db.refresh(new_user)
     
     return new_user
 
-@router.post('/token', status_code=status.HTTP_200_OK)
+# Rate limits first, so a throttled client never takes a place in the
+# login queue; the queue then bounds how much bcrypt work is in flight.
+@router.post('/token', status_code=status.HTTP_200_OK, response_model=Token,
+             dependencies=[Depends(login_rate_limit), Depends(login_limiter, scope="function")])
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], 
                                  db: db_dependency):
-     user = user_authentification(form_data.username, form_data.password, db)
+     user = await user_authentification(form_data.username, form_data.password, db)
      
      if not user:
          raise HTTPException(status_code=401, detail="Authentication failed")
      
      token = create_access_token(user.username, user.id, user.is_admin, expires_delta=timedelta(minutes=20))
-     return {"access_token": token, "token_type": "bearer"}
\ No newline at end of file
+     return {"access_token": token, "token_type": "bearer"}
+
+def revoke_statement(dialect_name: str):
+    # A token already revoked through another worker, which this one has
+    # not picked up yet, is left as it is instead of failing the insert.
+    statement = dialect_insert(dialect_name)(RevokedToken)
+    if dialect_name == "mysql":
+        return statement.prefix_with("IGNORE")
+    
+    return statement.on_conflict_do_nothing(index_elements=["token_hash"])
+
+@router.post('/logout', status_code=status.HTTP_200_OK, response_model=MessageResponce)
+async def logout(token: Annotated[str, Depends(oauth_bearer)], db: db_dependency):
+    user, expires_at = decode_token(token)
+    key = token_hash(token)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    
+    await auth_state.ensure_fresh()
+    if auth_state.is_rejected(key, user['user_id']):
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    await db.execute(delete(RevokedToken).filter(RevokedToken.expires_at <= now))
+    await db.execute(revoke_statement(db.bind.dialect.name),
+                     {"token_hash": key,
+                      "expires_at": datetime.fromtimestamp(expires_at, timezone.utc).replace(tzinfo=None)})
+    
+    after_commit(db, lambda: auth_state.revoke(key, expires_at))
+    after_commit(db, lambda: claims_cache.discard(key))
+    
+    return {"message": "Logged out successfully"}
+
+@router.patch('/user/{user_id}/active', status_code=status.HTTP_200_OK, response_model=MessageResponce)
+async def set_user_active(user: Annotated[dict, Depends(get_current_user)], db: db_dependency,
+                          user_id: int, update: UpdateUserActive):
+    if not user or user.get('is_admin', False) != 1:
+        raise HTTPException(status_code=403, detail="You do not have permission to update users")
+    
+    target = await db.get(Users, user_id)
+    
+    if not target:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    target.is_active = update.is_active
+    
+    after_commit(db, lambda: auth_state.set_active(user_id, update.is_active))
+    
+    return {"message": "User updated successfully"}
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
 from starlette import status
-from typing import Annotated
-from database import SessionLocal
-from sqlalchemy.orm import Session
-from models import Exercise, MuscleGroupEnum, CategoryEnum
+from typing import Annotated, List, Optional
+from database import db_dependency, read_db_dependency, after_commit
+from sqlalchemy import select, update
+from models import Exercise, Workout_Exercises, Workout_Plan, MuscleGroupEnum, CategoryEnum
 from pydantic import BaseModel
-from .auth import get_current_user
+from .auth import get_current_user, MessageResponce
+from catalog_cache import CatalogCache, bump_version
+from rollups import add_matching_volume
+from pagination import Page, DEFAULT_PAGE_SIZE, limit_query, cursor_query, decode_cursor, encode_cursor
 
 
 router = APIRouter(
@@ -13,15 +17,7 @@ router = APIRouter(
     tags=['exercises']
 )
 
-def get_db():
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
-        
 user_dependency = Annotated[dict, Depends(get_current_user)]
-db_dependency = Annotated[Session, Depends(get_db)]
 
 class ExerciseRequest(BaseModel):
     name: str    
@@ -40,30 +36,58 @@ class ExerciseResponce(BaseModel):
         from_attributes = True
 
 
-@router.get("/", status_code=status.HTTP_200_OK)
-async def get_all_exercise(db: db_dependency):
-    exercises= db.query(Exercise).all()
+catalog_cache = CatalogCache(ExerciseResponce)
+
+def catalog_response(body: bytes, if_none_match: Optional[str]):
+    if catalog_cache.matches(if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": catalog_cache.etag})
     
-    if not exercises:
+    return Response(content=body, media_type="application/json", headers={"ETag": catalog_cache.etag})
+
+
+@router.get("/", status_code=status.HTTP_200_OK, response_model=Page[ExerciseResponce])
+async def get_all_exercise(db: read_db_dependency, category: Optional[CategoryEnum] = None,
+                           muscle_category: Optional[MuscleGroupEnum] = None,
+                           limit: limit_query = DEFAULT_PAGE_SIZE, cursor: cursor_query = None,
+                           if_none_match: Annotated[Optional[str], Header()] = None):
+    catalog = await catalog_cache.load(db)
+    exercises, last_id = catalog.page(decode_cursor(cursor), limit, category, muscle_category)
+    
+    if not exercises and cursor is None:
         raise HTTPException(status_code=404, detail="Exercise not found")
     
-    return exercises
+    next_cursor = encode_cursor(last_id) if last_id is not None else None
+    body = b'{"items":[' + b",".join(exercises) + b'],"next_cursor":' + json.dumps(next_cursor).encode() + b"}"
+    
+    return catalog_response(body, if_none_match)
 
-@router.get("/{exercise_id}", status_code=status.HTTP_200_OK)
-async def get_exercise(db: db_dependency, exercise_id: int):
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+@router.get("/search", status_code=status.HTTP_200_OK, response_model=List[ExerciseResponce])
+async def search_exercise(db: read_db_dependency, q: Annotated[str, Query(min_length=1, max_length=100)],
+                          category: Optional[CategoryEnum] = None, muscle_category: Optional[MuscleGroupEnum] = None,
+                          limit: limit_query = 20,
+                          if_none_match: Annotated[Optional[str], Header()] = None):
+    catalog = await catalog_cache.load(db)
+    ids = catalog.search.search(q, limit, category, muscle_category)
+    body = b"[" + b",".join(catalog.items[exercise_id] for exercise_id in ids) + b"]"
+    
+    return catalog_response(body, if_none_match)
+
+@router.get("/{exercise_id}", status_code=status.HTTP_200_OK, response_model=ExerciseResponce)
+async def get_exercise(db: read_db_dependency, exercise_id: int, if_none_match: Annotated[Optional[str], Header()] = None):
+    catalog = await catalog_cache.load(db)
+    exercise = catalog.items.get(exercise_id)
     
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
     
-    return exercise
+    return catalog_response(exercise, if_none_match)
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=ExerciseResponce)
 async def create_exercise(user: user_dependency, db: db_dependency, exercise: ExerciseRequest):
     if not user or user.get('is_admin', False) != 1:
         raise HTTPException(status_code=403, detail="You don't have permission to create")
     
-    exsisting_exercise = db.query(Exercise).filter(Exercise.name == exercise.name).first()
+    exsisting_exercise = await db.scalar(select(Exercise).filter(Exercise.name == exercise.name))
     
     if exsisting_exercise:
         raise HTTPException(status_code=400, detail="Exercise with this name already exists")
@@ -71,32 +95,45 @@ async def create_exercise(user: user_dependency, db: db_dependency, exercise: Ex
     new_exercise = Exercise(**exercise.model_dump())
 
     db.add(new_exercise)
-    db.commit()
-    db.refresh(new_exercise)
+    version = await bump_version(db)
+    await db.flush()
+    await db.refresh(new_exercise)
+    after_commit(db, lambda: catalog_cache.apply(version, exercise=new_exercise))
     
     return new_exercise
     
-@router.delete("/{exercise_id}", status_code=status.HTTP_200_OK)
+@router.delete("/{exercise_id}", status_code=status.HTTP_200_OK, response_model=MessageResponce)
 async def delete_exercise(user: user_dependency, db: db_dependency, exercise_id: int):
     if not user or user.get('is_admin', False) != 1:
         raise HTTPException(status_code=403, detail="You do not have permission to delete")
     
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    exercise = await db.get(Exercise, exercise_id)
     
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
     
-    db.delete(exercise)
-    db.commit()
+    # The database deletes every workout entry of the exercise with it, so
+    # the rollup and the versions of the plans that lose an entry are
+    # settled first, each in one statement.
+    await add_matching_volume(db, Workout_Exercises.exercise_id == exercise_id, sign=-1)
+    await db.execute(update(Workout_Plan)
+                     .filter(Workout_Plan.id.in_(select(Workout_Exercises.workout_plan_id)
+                                                 .filter(Workout_Exercises.exercise_id == exercise_id)))
+                     .values(version=Workout_Plan.version + 1)
+                     .execution_options(synchronize_session=False))
+    
+    await db.delete(exercise)
+    version = await bump_version(db)
+    after_commit(db, lambda: catalog_cache.apply(version, removed_id=exercise_id))
     
     return {"message": "Exercise deleted successfully"}
 
-@router.put("/{exercise_id}", status_code=status.HTTP_200_OK)
+@router.put("/{exercise_id}", status_code=status.HTTP_200_OK, response_model=ExerciseResponce)
 async def update_exercise(user: user_dependency, db: db_dependency, exercise_id: int, exercise_request: ExerciseRequest):
     if not user or user.get('is_admin', False) != 1:
         raise HTTPException(status_code=403, detail="You do not have permission to update")
     
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    exercise = await db.get(Exercise, exercise_id)
     
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
@@ -106,8 +143,10 @@ async def update_exercise(user: user_dependency, db: db_dependency, exercise_id:
     exercise.category = exercise_request.category
     exercise.muscle_category = exercise_request.muscle_category
     
-    db.commit()
-    db.refresh(exercise)
+    version = await bump_version(db)
+    await db.flush()
+    await db.refresh(exercise)
+    after_commit(db, lambda: catalog_cache.apply(version, exercise=exercise))
     
     return exercise
 
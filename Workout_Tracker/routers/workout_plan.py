@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from starlette import status
-from typing import Annotated
-from database import SessionLocal
-from sqlalchemy.orm import Session
-from models import Workout_Plan, StatusEnum
-from pydantic import BaseModel, field_validator
-from .auth import get_current_user
+from typing import Annotated, List, Optional
+from database import db_dependency, read_db_dependency
+from sqlalchemy import select, delete, update, case, literal
+from sqlalchemy.orm import selectinload
+from models import Workout_Plan, Workout_Exercises, StatusEnum
+from pydantic import BaseModel, Field, field_validator
+from .auth import get_current_user, MessageResponce
+from .wourkout_exercise import WorkoutExerciseResponce
 from datetime import datetime
+from pagination import Page, DEFAULT_PAGE_SIZE, limit_query, cursor_query, keyset_page, make_page
+from rollups import counts_towards_volume, plan_totals, add_volume, add_matching_volume, week_start
+from records import add_records, record_pairs, recompute_records, plan_entries
+from export import EXPORT_FORMATS, stream_history
+from importer import import_history
+import etags
+from admission import bulk_limiter
 
 
 router = APIRouter(
@@ -14,13 +25,6 @@ router = APIRouter(
     tags=['workout_plan']
 )
 
-def get_db():
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
-
 class UpdateWorkoutTime(BaseModel):        
     schedule: datetime 
     
@@ -36,91 +40,338 @@ class WorkoutPlanRequest(UpdateWorkoutTime):
     
 class UpdateWorkoutStatus(BaseModel):        
     status: StatusEnum 
+    
+class WorkoutPlanResponce(BaseModel):
+    id: int
+    user_id: int
+    schedule: Optional[datetime]
+    status: StatusEnum
+    
+    class Config:
+        from_attributes = True
+        
+class WorkoutPlanFullResponce(WorkoutPlanResponce):
+    exercises: List[WorkoutExerciseResponce] = Field(validation_alias="workout_exercise")
+    
+class BatchPlanItem(BaseModel):
+    id: int
+    status: Optional[StatusEnum] = None
+    schedule: Optional[datetime] = None
+    
+    @field_validator('schedule', mode='before')
+    def parse_schedule(cls, v):
+        return UpdateWorkoutTime.parse_schedule(v) if v is not None else None
+    
+MAX_BATCH_PLANS = 1000
+    
+class BatchPlanRequest(BaseModel):
+    plans: List[BatchPlanItem] = Field(min_length=1, max_length=MAX_BATCH_PLANS)
+    
+class UpdatedResponce(BaseModel):
+    updated: int
+    
+class DeletedResponce(BaseModel):
+    deleted: int
+    
+class ImportErrorResponce(BaseModel):
+    row: int
+    error: str
+    
+class ImportResponce(BaseModel):
+    plans: int
+    exercises: int
+    error_count: int
+    errors: List[ImportErrorResponce]
         
          
 user_dependency = Annotated[dict, Depends(get_current_user)]
-db_dependency = Annotated[Session, Depends(get_db)]
 
-def get_user_plan(user, plan_id, db):
-    plan = db.query(Workout_Plan).filter(Workout_Plan.user_id == user.get('user_id'))\
-    .filter(Workout_Plan.id == plan_id).first()
+# Read endpoints select just these columns and validate the rows
+# directly, without building ORM objects for them.
+plan_columns = (Workout_Plan.id, Workout_Plan.user_id, Workout_Plan.schedule, Workout_Plan.status)
+
+def plan_etag(plan):
+    return f'"plan-{plan.id}-{plan.version}"'
+
+def page_etag(plans):
+    # A page's body is decided by which plans are on it and their
+    # versions, so that is all the tag has to cover.
+    digest = hashlib.blake2b(",".join(f"{plan.id}.{plan.version}" for plan in plans).encode(), digest_size=12)
+    return f'"plans-{digest.hexdigest()}"'
+
+def not_modified(etag):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+async def get_user_plan(user, plan_id, db, if_match=None):
+    # Locked until the request's transaction commits, so a concurrent
+    # change to the same plan waits and then sees the new version.
+    plan = await db.scalar(select(Workout_Plan).filter(Workout_Plan.user_id == user.get('user_id'))
+                           .filter(Workout_Plan.id == plan_id).with_for_update())
     
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
     
+    if if_match is not None and not etags.matches(if_match, plan_etag(plan), weak=False):
+        raise HTTPException(status_code=412, detail="Plan was changed since it was read")
+    
     return plan
 
 
-@router.post('/', status_code=status.HTTP_201_CREATED)
-async def create_workout_plan(user: user_dependency, db: db_dependency, plan: WorkoutPlanRequest):
+@router.post('/', status_code=status.HTTP_201_CREATED, response_model=WorkoutPlanResponce)
+async def create_workout_plan(user: user_dependency, db: db_dependency, plan: WorkoutPlanRequest, response: Response):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
     user_plan = Workout_Plan(**plan.model_dump(), user_id = user.get('user_id'))
     
     db.add(user_plan)
-    db.commit()
-    db.refresh(user_plan)
+    await db.flush()
+    await db.refresh(user_plan)
+    response.headers["ETag"] = plan_etag(user_plan)
     
     return user_plan 
     
-@router.get('/', status_code=status.HTTP_200_OK)
-async def get_all_plan(user: user_dependency, db: db_dependency):
+@router.get('/', status_code=status.HTTP_200_OK, response_model=Page[WorkoutPlanResponce])
+async def get_all_plan(user: user_dependency, db: read_db_dependency, response: Response,
+                       plan_status: Annotated[Optional[StatusEnum], Query(alias="status")] = None,
+                       schedule_from: Optional[datetime] = None, schedule_to: Optional[datetime] = None,
+                       limit: limit_query = DEFAULT_PAGE_SIZE, cursor: cursor_query = None,
+                       if_none_match: Annotated[Optional[str], Header()] = None):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
-    plans = db.query(Workout_Plan).filter(Workout_Plan.user_id == user.get('user_id')).all()
+    query = select(*plan_columns, Workout_Plan.version).filter(Workout_Plan.user_id == user.get('user_id'))
+    
+    if plan_status is not None:
+        query = query.filter(Workout_Plan.status == plan_status)
+    if schedule_from is not None:
+        query = query.filter(Workout_Plan.schedule >= schedule_from)
+    if schedule_to is not None:
+        query = query.filter(Workout_Plan.schedule <= schedule_to)
     
-    if not plans:
+    # Filtered by schedule, the page follows ix_workout_plan_user_id_schedule
+    # and goes in schedule order; otherwise ix_workout_plan_user_id_id and
+    # id order.
+    key = "schedule" if schedule_from is not None or schedule_to is not None else None
+    key_column = Workout_Plan.schedule if key else None
+    plans = (await db.execute(keyset_page(query, Workout_Plan.id, cursor, limit, key_column))).all()
+    
+    if not plans and cursor is None:
         raise HTTPException(status_code=404, detail="Plans not found")
     
-    return plans
+    # A poll that comes back unchanged costs the one query and no
+    # serialization.
+    etag = page_etag(plans)
+    if etags.matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    response.headers["ETag"] = etag
+    return make_page(plans, limit, key)
+
+@router.get('/export', status_code=status.HTTP_200_OK)
+async def export_history(user: user_dependency,
+                         export_format: Annotated[str, Query(alias="format", pattern="^(ndjson|csv)$")] = "ndjson"):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    return StreamingResponse(stream_history(user.get('user_id'), export_format),
+                             media_type=EXPORT_FORMATS[export_format],
+                             headers={"Content-Disposition": f'attachment; filename="workouts.{export_format}"'})
+
+@router.post('/import', status_code=status.HTTP_200_OK, response_model=ImportResponce,
+              dependencies=[Depends(bulk_limiter, scope="function")])
+async def import_plans(user: user_dependency, request: Request,
+                       import_format: Annotated[str, Query(alias="format", pattern="^(ndjson|csv)$")] = "ndjson"):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    # The body is parsed as it arrives and written in chunks, each in its
+    # own transaction; rejected rows are listed in the response.
+    return await import_history(user.get('user_id'), request.stream(), import_format)
 
-@router.get('/{plan_id}', status_code=status.HTTP_200_OK)
-async def get_plan_by_id(user: user_dependency, db: db_dependency, plan_id: int):
+@router.delete('/', status_code=status.HTTP_200_OK, response_model=DeletedResponce,
+               dependencies=[Depends(bulk_limiter, scope="function")])
+async def delete_plans(user: user_dependency, db: db_dependency,
+                       plan_status: Annotated[Optional[StatusEnum], Query(alias="status")] = None,
+                       schedule_from: Optional[datetime] = None, schedule_to: Optional[datetime] = None):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
-    plan = get_user_plan(user, plan_id, db)
+    if plan_status is None and schedule_from is None and schedule_to is None:
+        raise HTTPException(status_code=400, detail="Give a status or a schedule range to delete by")
+    
+    filters = [Workout_Plan.user_id == user.get('user_id')]
+    if plan_status is not None:
+        filters.append(Workout_Plan.status == plan_status)
+    if schedule_from is not None:
+        filters.append(Workout_Plan.schedule >= schedule_from)
+    if schedule_to is not None:
+        filters.append(Workout_Plan.schedule <= schedule_to)
+    
+    # Lock the plans so none of them changes status between taking their
+    # volume out and deleting them; their exercises go with them through
+    # ON DELETE CASCADE.
+    await db.execute(select(Workout_Plan.id).filter(*filters).with_for_update())
+    await add_matching_volume(db, *filters, sign=-1)
+    pairs = await record_pairs(db, *filters)
+    result = await db.execute(delete(Workout_Plan).filter(*filters).execution_options(synchronize_session=False))
+    await recompute_records(db, pairs)
+    
+    return {"deleted": result.rowcount}
+
+@router.patch('/batch', status_code=status.HTTP_200_OK, response_model=UpdatedResponce,
+              dependencies=[Depends(bulk_limiter, scope="function")])
+async def update_plans(user: user_dependency, db: db_dependency, batch: BatchPlanRequest):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    seen = set()
+    errors = []
+    for index, item in enumerate(batch.plans):
+        if item.id in seen:
+            errors.append({"loc": ["body", "plans", index, "id"], "msg": "Plan is listed twice", "input": item.id})
+        if item.status is None and item.schedule is None:
+            errors.append({"loc": ["body", "plans", index], "msg": "Give a status or a schedule", "input": item.id})
+        seen.add(item.id)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    
+    # Each changed column is a CASE over the plan ids, so every plan gets
+    # its own value in a single UPDATE; plans that aren't the user's are
+    # simply not matched.
+    values = {"version": Workout_Plan.version + 1}
+    for column in (Workout_Plan.status, Workout_Plan.schedule):
+        changes = {item.id: literal(getattr(item, column.key), column.type)
+                   for item in batch.plans if getattr(item, column.key) is not None}
+        if changes:
+            values[column.key] = case(changes, value=Workout_Plan.id, else_=column)
+    
+    filters = [Workout_Plan.user_id == user.get('user_id'), Workout_Plan.id.in_(seen)]
+    
+    # Volume of the completed plans is taken out before and put back after,
+    # which covers plans completed, un-completed and moved between weeks.
+    await db.execute(select(Workout_Plan.id).filter(*filters).with_for_update())
+    await add_matching_volume(db, *filters, sign=-1)
+    pairs = await record_pairs(db, *filters) if "status" in values else []
+    result = await db.execute(update(Workout_Plan).filter(*filters).values(values)
+                              .execution_options(synchronize_session=False))
+    await add_matching_volume(db, *filters)
+    
+    # Personal records only care about which plans are completed.
+    if "status" in values:
+        pairs = sorted(set(pairs).union(await record_pairs(db, *filters)))
+        await recompute_records(db, pairs)
+    
+    return {"updated": result.rowcount}
+
+@router.get('/{plan_id}', status_code=status.HTTP_200_OK, response_model=WorkoutPlanResponce)
+async def get_plan_by_id(user: user_dependency, db: read_db_dependency, plan_id: int, response: Response,
+                         if_none_match: Annotated[Optional[str], Header()] = None):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    plan = (await db.execute(select(*plan_columns, Workout_Plan.version)
+                             .filter(Workout_Plan.user_id == user.get('user_id'))
+                             .filter(Workout_Plan.id == plan_id))).first()
+    
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    
+    etag = plan_etag(plan)
+    if etags.matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    response.headers["ETag"] = etag
+    return plan
+
+@router.get('/{plan_id}/full', status_code=status.HTTP_200_OK, response_model=WorkoutPlanFullResponce)
+async def get_full_plan(user: user_dependency, db: read_db_dependency, plan_id: int):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+    
+    # Two round trips however long the plan is: the plan, then its
+    # exercises with their catalog rows joined in.
+    plan = await db.scalar(select(Workout_Plan)
+                           .options(selectinload(Workout_Plan.workout_exercise)
+                                    .joinedload(Workout_Exercises.exercise))
+                           .filter(Workout_Plan.user_id == user.get('user_id'))
+                           .filter(Workout_Plan.id == plan_id))
+    
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
     
     return plan
 
-@router.delete('/{plan_id}', status_code=status.HTTP_200_OK)
+@router.delete('/{plan_id}', status_code=status.HTTP_200_OK, response_model=MessageResponce)
 async def delete_plan(user: user_dependency, db: db_dependency, plan_id: int):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
-    plan = get_user_plan(user, plan_id, db)
+    plan = await get_user_plan(user, plan_id, db)
+    
+    if counts_towards_volume(plan):
+        await add_volume(db, plan.user_id, plan.schedule, await plan_totals(db, plan.id), sign=-1)
     
-    db.delete(plan)
-    db.commit()
+    pairs = await record_pairs(db, Workout_Plan.id == plan.id)
+    await db.delete(plan)
+    await db.flush()
+    await recompute_records(db, pairs)
     
     return {"message": "Workout plan deleted successfully"}
 
-@router.patch('/{plan_id}/schedule', status_code=status.HTTP_200_OK)
-async def change_workout_time(user: user_dependency, db: db_dependency, plan_id: int, plan_updated: UpdateWorkoutTime):
+@router.patch('/{plan_id}/schedule', status_code=status.HTTP_200_OK, response_model=WorkoutPlanResponce)
+async def change_workout_time(user: user_dependency, db: db_dependency, plan_id: int, plan_updated: UpdateWorkoutTime,
+                              response: Response, if_match: Annotated[Optional[str], Header()] = None):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
-    plan = get_user_plan(user, plan_id, db)
+    plan = await get_user_plan(user, plan_id, db, if_match)
+    
+    # A completed workout moved to another week takes its volume along.
+    if counts_towards_volume(plan) and week_start(plan.schedule) != week_start(plan_updated.schedule):
+        totals = await plan_totals(db, plan.id)
+        await add_volume(db, plan.user_id, plan.schedule, totals, sign=-1)
+        await add_volume(db, plan.user_id, plan_updated.schedule, totals)
     
     plan.schedule = plan_updated.schedule
+    plan.version = Workout_Plan.version + 1
     
-    db.commit()
-    db.refresh(plan)
+    await db.flush()
+    await db.refresh(plan)
+    response.headers["ETag"] = plan_etag(plan)
     
     return plan
 
-@router.patch('/{plan_id}/status', status_code=status.HTTP_200_OK)
-async def change_workout_status(user: user_dependency, db: db_dependency, plan_id: int, status_update: UpdateWorkoutStatus):
+@router.patch('/{plan_id}/status', status_code=status.HTTP_200_OK, response_model=WorkoutPlanResponce)
+async def change_workout_status(user: user_dependency, db: db_dependency, plan_id: int, status_update: UpdateWorkoutStatus,
+                                response: Response, if_match: Annotated[Optional[str], Header()] = None):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
-    plan = get_user_plan(user, plan_id, db)
+    plan = await get_user_plan(user, plan_id, db, if_match)
     
+    was_counted = counts_towards_volume(plan)
+    was_completed = plan.status == StatusEnum.completed
     plan.status = status_update.status
     
-    db.commit()
-    db.refresh(plan)
+    if was_counted != counts_towards_volume(plan):
+        await add_volume(db, plan.user_id, plan.schedule, await plan_totals(db, plan.id),
+                         sign=1 if not was_counted else -1)
+    
+    # Completing a workout can only raise records; un-completing one means
+    # working its exercises' records out again without it.
+    if was_completed != (plan.status == StatusEnum.completed):
+        entries = await plan_entries(db, plan.id)
+        if was_completed:
+            await db.flush()
+            await recompute_records(db, sorted({(plan.user_id, entry.exercise_id) for entry in entries}))
+        else:
+            await add_records(db, plan.user_id, entries)
+    
+    plan.version = Workout_Plan.version + 1
+    
+    await db.flush()
+    await db.refresh(plan)
+    response.headers["ETag"] = plan_etag(plan)
     
     return plan
\ No newline at end of file
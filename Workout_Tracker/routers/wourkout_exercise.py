@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
 from starlette import status
 from typing import Annotated, List
-from database import SessionLocal
-from sqlalchemy.orm import Session
-from models import Workout_Exercises, Exercise, Workout_Plan
-from pydantic import BaseModel, field_validator
-from .auth import get_current_user
-from datetime import datetime
+from database import db_dependency, read_db_dependency
+from sqlalchemy import select, insert
+from sqlalchemy.orm.attributes import set_committed_value
+from models import Workout_Exercises, Exercise, Workout_Plan, StatusEnum
+from pydantic import BaseModel, Field
+from .auth import get_current_user, MessageResponce
 from .exercise import ExerciseResponce
+from pagination import Page, DEFAULT_PAGE_SIZE, limit_query, cursor_query, keyset_page, make_page
+from rollups import counts_towards_volume, entry_totals, add_volume
+from records import add_records, remove_entry_record
+from admission import bulk_limiter
 
 
 router = APIRouter(
@@ -15,17 +19,15 @@ router = APIRouter(
     tags=['workout_exercises']
 )
 
-def get_db():
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
-        
 class AddExerciseRequest(BaseModel):
     sets: int
     reps: int
     weight: float
+    
+class BulkExerciseItem(AddExerciseRequest):
+    exercise_id: int
+    
+MAX_BULK_ITEMS = 100
          
 class WorkoutExerciseResponce(BaseModel):
     id: int
@@ -40,7 +42,16 @@ class WorkoutExerciseResponce(BaseModel):
     
     
 user_dependency = Annotated[dict, Depends(get_current_user)]
-db_dependency = Annotated[Session, Depends(get_db)]
+
+entry_columns = (Workout_Exercises.id, Workout_Exercises.workout_plan_id, Workout_Exercises.sets,
+                 Workout_Exercises.reps, Workout_Exercises.weight, Exercise.id.label("exercise_id"),
+                 Exercise.name, Exercise.description, Exercise.category, Exercise.muscle_category)
+
+def entry_from_row(row):
+    return {"id": row.id, "workout_plan_id": row.workout_plan_id, "sets": row.sets, "reps": row.reps,
+            "weight": row.weight, "exercise": {"id": row.exercise_id, "name": row.name,
+                                               "description": row.description, "category": row.category,
+                                               "muscle_category": row.muscle_category}}
 
 @router.post('/', status_code=status.HTTP_201_CREATED, response_model=WorkoutExerciseResponce)
 async def add_exercise(user: user_dependency, db: db_dependency, 
@@ -49,60 +60,142 @@ async def add_exercise(user: user_dependency, db: db_dependency,
     if not user:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    exercise = await db.get(Exercise, exercise_id)
     
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
     
-    workout_plan = db.query(Workout_Plan).filter(Workout_Plan.user_id == user.get('user_id'))\
-        .filter(Workout_Plan.id == plan_id).first()
+    workout_plan = await db.scalar(select(Workout_Plan).filter(Workout_Plan.user_id == user.get('user_id'))
+                                   .filter(Workout_Plan.id == plan_id).with_for_update())
         
     if not workout_plan:
         raise HTTPException(status_code=404, detail="Workout plan not found")
     
+    # The plan's ETag covers its exercises too.
+    workout_plan.version = Workout_Plan.version + 1
+    
     new_exercise = Workout_Exercises(**exercise_request.model_dump(), workout_plan_id=workout_plan.id, exercise_id=exercise.id)
     
     db.add(new_exercise)
-    db.commit()
-    db.refresh(new_exercise)
+    await db.flush()
+    await db.refresh(new_exercise, attribute_names=["exercise"])
+    
+    if counts_towards_volume(workout_plan):
+        await add_volume(db, workout_plan.user_id, workout_plan.schedule, entry_totals([(exercise, new_exercise)]))
+    
+    if workout_plan.status == StatusEnum.completed:
+        await add_records(db, workout_plan.user_id, [(exercise.id, new_exercise.reps, new_exercise.weight)])
     
     return new_exercise
 
-@router.get('/', response_model=List[WorkoutExerciseResponce], status_code=status.HTTP_200_OK)
-async def get_all_exercise(user: user_dependency, db: db_dependency, plan_id: int):
+@router.post('/bulk', status_code=status.HTTP_201_CREATED, response_model=List[WorkoutExerciseResponce],
+             dependencies=[Depends(bulk_limiter, scope="function")])
+async def add_exercises_bulk(user: user_dependency, db: db_dependency, plan_id: int,
+                             items: Annotated[List[BulkExerciseItem], Field(min_length=1, max_length=MAX_BULK_ITEMS)]):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
-    workout_plan = db.query(Workout_Plan).filter(Workout_Plan.user_id == user.get('user_id'))\
-        .filter(Workout_Plan.id == plan_id).first()
+    workout_plan = await db.scalar(select(Workout_Plan).filter(Workout_Plan.user_id == user.get('user_id'))
+                                   .filter(Workout_Plan.id == plan_id).with_for_update())
         
     if not workout_plan:
         raise HTTPException(status_code=404, detail="Workout plan not found")
     
-    all_exercise = db.query(Workout_Exercises).filter(Workout_Exercises.workout_plan_id == workout_plan.id).all()
+    workout_plan.version = Workout_Plan.version + 1
+    
+    exercise_ids = {item.exercise_id for item in items}
+    exercises = {exercise.id: exercise for exercise in
+                 await db.scalars(select(Exercise).filter(Exercise.id.in_(exercise_ids)))}
+    
+    # Nothing is written unless every item is valid; the errors point at
+    # the offending items the same way request validation errors do.
+    errors = [
+        {"loc": ["body", index, "exercise_id"], "msg": "Exercise not found", "input": item.exercise_id}
+        for index, item in enumerate(items) if item.exercise_id not in exercises
+    ]
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    
+    rows = [dict(item.model_dump(), workout_plan_id=plan_id) for item in items]
+    
+    # One multi-row INSERT ... RETURNING where the database supports it;
+    # MySQL has no RETURNING, so the ORM inserts row by row there, still
+    # inside the same transaction.
+    if db.bind.dialect.insert_executemany_returning:
+        new_exercises = sorted((await db.scalars(insert(Workout_Exercises).returning(Workout_Exercises), rows)).all(),
+                               key=lambda new_exercise: new_exercise.id)
+    else:
+        new_exercises = [Workout_Exercises(**row) for row in rows]
+        db.add_all(new_exercises)
+        await db.flush()
+    
+    if counts_towards_volume(workout_plan):
+        await add_volume(db, workout_plan.user_id, workout_plan.schedule,
+                         entry_totals((exercises[item.exercise_id], item) for item in items))
+    
+    if workout_plan.status == StatusEnum.completed:
+        await add_records(db, workout_plan.user_id, [(item.exercise_id, item.reps, item.weight) for item in items])
+    
+    # Hand over the catalog rows from the IN query so serializing the
+    # nested exercise does not lazy-load them one by one.
+    for new_exercise in new_exercises:
+        set_committed_value(new_exercise, "exercise", exercises[new_exercise.exercise_id])
+    
+    return new_exercises
+
+@router.get('/', response_model=Page[WorkoutExerciseResponce], status_code=status.HTTP_200_OK)
+async def get_all_exercise(user: user_dependency, db: read_db_dependency, plan_id: int,
+                           limit: limit_query = DEFAULT_PAGE_SIZE, cursor: cursor_query = None):
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication failed")
     
-    return all_exercise
+    # Ownership check and the catalog row ride along in the same SELECT,
+    # read as plain rows rather than ORM objects.
+    query = select(*entry_columns).join(Workout_Exercises.workout_plan).join(Workout_Exercises.exercise)\
+        .filter(Workout_Plan.user_id == user.get('user_id'))\
+        .filter(Workout_Exercises.workout_plan_id == plan_id)
+    all_exercise = (await db.execute(keyset_page(query, Workout_Exercises.id, cursor, limit))).all()
+    
+    # An empty first page is either an empty plan or someone else's plan.
+    if not all_exercise and cursor is None:
+        workout_plan = await db.scalar(select(Workout_Plan.id).filter(Workout_Plan.user_id == user.get('user_id'))
+                                       .filter(Workout_Plan.id == plan_id))
+        if not workout_plan:
+            raise HTTPException(status_code=404, detail="Workout plan not found")
+    
+    page = make_page(all_exercise, limit)
+    page["items"] = [entry_from_row(row) for row in page["items"]]
+    return page
 
-@router.delete('/{exercise_id}', status_code=status.HTTP_200_OK)
+@router.delete('/{exercise_id}', status_code=status.HTTP_200_OK, response_model=MessageResponce)
 async def delete_exercise_from_plan(user: user_dependency, db: db_dependency,
                                     plan_id: int, exercise_id: int):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication failed")
     
-    workout_plan = db.query(Workout_Plan).filter(Workout_Plan.user_id == user.get('user_id'))\
-        .filter(Workout_Plan.id == plan_id).first()
+    workout_plan = await db.scalar(select(Workout_Plan).filter(Workout_Plan.user_id == user.get('user_id'))
+                                   .filter(Workout_Plan.id == plan_id).with_for_update())
         
     if not workout_plan:
         raise HTTPException(status_code=404, detail="Workout plan not found")
     
-    exercise = db.query(Workout_Exercises).filter(Workout_Exercises.workout_plan_id == workout_plan.id)\
-        .filter(Workout_Exercises.exercise_id == exercise_id).first()
+    workout_plan.version = Workout_Plan.version + 1
+    
+    exercise = await db.scalar(select(Workout_Exercises).filter(Workout_Exercises.workout_plan_id == workout_plan.id)
+                               .filter(Workout_Exercises.exercise_id == exercise_id))
     
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
     
-    db.delete(exercise)
-    db.commit()
+    await db.delete(exercise)
+    
+    if counts_towards_volume(workout_plan):
+        await add_volume(db, workout_plan.user_id, workout_plan.schedule,
+                         entry_totals([(await db.get(Exercise, exercise.exercise_id), exercise)]), sign=-1)
+    
+    if workout_plan.status == StatusEnum.completed:
+        await db.flush()
+        await remove_entry_record(db, workout_plan.user_id, exercise.exercise_id, exercise.reps, exercise.weight)
     
     return {"message": "exercise delete successfully"}
     
\ No newline at end of file
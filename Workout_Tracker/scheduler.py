@@ -0,0 +1,57 @@
+import asyncio
+import argparse
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update
+from models import Workout_Plan, StatusEnum
+from database import AsyncSessionLocal
+from settings import getenv
+
+# A pending plan this long past its schedule is marked skipped.
+# Schedules are stored without a time zone, so the default leaves a day
+# of slack for clients that send local times.
+OVERDUE_GRACE_HOURS = float(getenv("OVERDUE_GRACE_HOURS", "24"))
+# Seconds between sweeps in each worker; 0 turns the in-process job off,
+# for deployments that run `python scheduler.py` from cron instead.
+OVERDUE_SWEEP_INTERVAL = float(getenv("OVERDUE_SWEEP_INTERVAL", "300"))
+
+logger = logging.getLogger("workout_tracker.scheduler")
+
+
+def overdue_statement(now: datetime):
+    # One UPDATE over ix_workout_plan_status_schedule; pending plans don't
+    # count towards weekly volume, so the rollup has nothing to adjust.
+    cutoff = now - timedelta(hours=OVERDUE_GRACE_HOURS)
+    return update(Workout_Plan)\
+        .filter(Workout_Plan.status == StatusEnum.pending)\
+        .filter(Workout_Plan.schedule < cutoff)\
+        .values(status=StatusEnum.skipped, version=Workout_Plan.version + 1)\
+        .execution_options(synchronize_session=False)
+
+async def mark_overdue_plans(now=None):
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(overdue_statement(now))
+        await db.commit()
+        return result.rowcount
+
+async def run_overdue_sweeps():
+    # Every worker runs this; the UPDATE is idempotent, so overlapping
+    # sweeps just find nothing left to do. The random start keeps workers
+    # that booted together from sweeping in lockstep.
+    await asyncio.sleep(random.uniform(0, OVERDUE_SWEEP_INTERVAL))
+    while True:
+        try:
+            skipped = await mark_overdue_plans()
+            if skipped:
+                logger.info("Marked %d overdue plans as skipped", skipped)
+        except Exception:
+            logger.exception("Overdue plan sweep failed")
+        await asyncio.sleep(OVERDUE_SWEEP_INTERVAL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mark pending plans past their schedule as skipped.")
+    parser.parse_args()
+    print(f"Marked {asyncio.run(mark_overdue_plans())} overdue plans as skipped")
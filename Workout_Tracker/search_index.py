@@ -0,0 +1,163 @@
+import math
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+# Share of the query's trigrams a name or description must contain to
+# match. Lower is more forgiving of typos and noisier.
+SEARCH_SIMILARITY = 0.4
+
+word_pattern = re.compile(r"[0-9a-z]+")
+
+
+@lru_cache(maxsize=65536)
+def word_trigrams(word):
+    # Each word is padded so prefixes get trigrams of their own: "bench"
+    # gives "  b", " be", "ben", "enc", "nch", "ch ".
+    padded = f"  {word} "
+    return frozenset(padded[index:index + 3] for index in range(len(padded) - 2))
+
+def trigrams(text):
+    return frozenset().union(*map(word_trigrams, word_pattern.findall((text or "").lower())))
+
+def to_bitmap(ids, size):
+    bits = bytearray(size // 8 + 1)
+    for exercise_id in ids:
+        bits[exercise_id >> 3] |= 1 << (exercise_id & 7)
+    return int.from_bytes(bits, "little")
+
+def bit_ids(bitmap, limit):
+    ids = []
+    while bitmap and len(ids) < limit:
+        lowest = bitmap & -bitmap
+        ids.append(lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return ids
+
+
+class BitCounter:
+    # Per-exercise match counts for every exercise at once, kept as binary
+    # digits across a few big ints (bit i of slices[0] is the lowest digit
+    # of exercise i's count). Adding a posting bitmap is a ripple carry.
+    def __init__(self):
+        self.slices = []
+
+    def add(self, bitmap):
+        carry = bitmap
+        for index, digit in enumerate(self.slices):
+            if not carry:
+                return
+            self.slices[index], carry = digit ^ carry, digit & carry
+        if carry:
+            self.slices.append(carry)
+
+    def equal(self, count, universe):
+        if count >> len(self.slices):
+            return 0
+        bitmap = universe
+        for index, digit in enumerate(self.slices):
+            bitmap &= digit if count >> index & 1 else universe ^ digit
+        return bitmap
+
+
+class SearchIndex:
+    # Exercise ids are bit positions: every trigram, category and muscle
+    # group maps to a bitmap of the exercises that have it.
+    def __init__(self):
+        self.name_postings = defaultdict(int)
+        self.text_postings = defaultdict(int)
+        self.facets = defaultdict(int)
+        self.docs = {}
+        self.universe = 0
+
+    @staticmethod
+    def document(exercise):
+        return exercise.name, exercise.description, exercise.category, exercise.muscle_category
+
+    @staticmethod
+    def keys(doc):
+        name, description, category, muscle_category = doc
+        name_grams = trigrams(name)
+        return (name_grams, name_grams | trigrams(description),
+                (("category", category), ("muscle_category", muscle_category)))
+
+    @classmethod
+    def build(cls, exercises):
+        # Goes through distinct words rather than exercises: a word's
+        # trigrams are worked out once and its exercise ids are copied into
+        # each trigram's posting in bulk, then every posting is packed into
+        # a bitmap in one pass.
+        index = cls()
+        name_words, text_words, facets = defaultdict(list), defaultdict(list), defaultdict(list)
+        for exercise in exercises:
+            doc = index.docs[exercise.id] = cls.document(exercise)
+            words = set(word_pattern.findall((doc[0] or "").lower()))
+            for word in words:
+                name_words[word].append(exercise.id)
+            for word in words.union(word_pattern.findall((doc[1] or "").lower())):
+                text_words[word].append(exercise.id)
+            facets["category", doc[2]].append(exercise.id)
+            facets["muscle_category", doc[3]].append(exercise.id)
+
+        size = max(index.docs, default=0)
+        for target, words in ((index.name_postings, name_words), (index.text_postings, text_words)):
+            postings = defaultdict(list)
+            for word, ids in words.items():
+                for gram in word_trigrams(word):
+                    postings[gram].extend(ids)
+            for gram, ids in postings.items():
+                target[gram] = to_bitmap(ids, size)
+        for facet, ids in facets.items():
+            index.facets[facet] = to_bitmap(ids, size)
+        index.universe = to_bitmap(index.docs, size)
+        return index
+
+    def add(self, exercise):
+        self.remove(exercise.id)
+        bit = 1 << exercise.id
+        doc = self.docs[exercise.id] = self.document(exercise)
+        for postings, keys in zip((self.name_postings, self.text_postings, self.facets), self.keys(doc)):
+            for key in keys:
+                postings[key] |= bit
+        self.universe |= bit
+
+    def remove(self, exercise_id):
+        doc = self.docs.pop(exercise_id, None)
+        if doc is None:
+            return
+        mask = ~(1 << exercise_id)
+        for postings, keys in zip((self.name_postings, self.text_postings, self.facets), self.keys(doc)):
+            for key in keys:
+                postings[key] &= mask
+                if not postings[key]:
+                    del postings[key]
+        self.universe &= mask
+
+    def search(self, query, limit, category=None, muscle_category=None):
+        allowed = self.universe
+        if category is not None:
+            allowed &= self.facets.get(("category", category), 0)
+        if muscle_category is not None:
+            allowed &= self.facets.get(("muscle_category", muscle_category), 0)
+
+        grams = trigrams(query)
+        if not grams:
+            return bit_ids(allowed, limit)
+
+        names, texts = BitCounter(), BitCounter()
+        for gram in grams:
+            names.add(self.name_postings.get(gram, 0) & allowed)
+            texts.add(self.text_postings.get(gram, 0) & allowed)
+
+        # Best name matches first, then matches that only made it through
+        # the description; ties in id order.
+        threshold = max(1, math.ceil(len(grams) * SEARCH_SIMILARITY))
+        ids, seen = [], 0
+        for counter in (names, texts):
+            for count in range(len(grams), threshold - 1, -1):
+                level = counter.equal(count, allowed) & ~seen
+                ids.extend(bit_ids(level, limit - len(ids)))
+                seen |= level
+                if len(ids) >= limit:
+                    return ids
+        return ids
@@ -0,0 +1,57 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from settings import getenv
+
+BCRYPT_ROUNDS = int(getenv("BCRYPT_ROUNDS", "12"))
+HASH_EXECUTOR = getenv("HASH_EXECUTOR", "thread")
+HASH_WORKERS = int(getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_SIZE = int(getenv("HASH_QUEUE_SIZE", "64"))
+
+bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto',
+                              bcrypt__default_rounds=BCRYPT_ROUNDS,
+                              bcrypt__min_rounds=BCRYPT_ROUNDS,
+                              bcrypt__max_rounds=BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so threads already hash in parallel; processes
+# are there for hosts where other CPU work competes for the interpreter.
+if HASH_EXECUTOR == "process":
+    hash_executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+else:
+    hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+# One slot per running job plus the allowed backlog; when every slot is
+# taken the request is rejected instead of queueing without bound.
+hash_slots = asyncio.Semaphore(HASH_WORKERS + HASH_QUEUE_SIZE)
+
+
+def _hash(password: str):
+    return bcrypt_context.hash(password)
+
+def _verify(password: str, hashed_password: str):
+    if not bcrypt_context.verify(password, hashed_password):
+        return False, None
+    
+    if bcrypt_context.needs_update(hashed_password):
+        return True, bcrypt_context.hash(password)
+    
+    return True, None
+
+async def run_in_hash_pool(func, *args):
+    if hash_slots.locked():
+        raise HTTPException(status_code=503, detail="Too many authentication requests",
+                            headers={"Retry-After": "1"})
+    
+    async with hash_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hash_executor, func, *args)
+
+async def hash_password(password: str):
+    return await run_in_hash_pool(_hash, password)
+
+# Returns (is_valid, new_hash); new_hash is only set when the stored hash
+# was made with an outdated bcrypt cost and should be saved instead.
+async def verify_password(password: str, hashed_password: str):
+    return await run_in_hash_pool(_verify, password, hashed_password)
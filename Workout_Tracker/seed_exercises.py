@@ -1,6 +1,8 @@
+import sys
 from sqlalchemy.orm import Session
-from models import Exercise
-from database import SessionLocal
+from models import Exercise, CatalogVersion
+from catalog_cache import bump_catalog_version
+from database import SessionLocal, dialect_insert
 
 exercise_data = [
     {
@@ -89,16 +91,43 @@ exercise_data = [
     },
 ]
 
-def seed_exercise():
+UPSERT_BATCH_SIZE = 500
+
+def upsert_statement(dialect_name: str, rows, update: bool):
+    statement = dialect_insert(dialect_name)(Exercise).values(rows)
+    columns = ("description", "category", "muscle_category")
+    
+    if dialect_name == "mysql":
+        if update:
+            return statement.on_duplicate_key_update({column: statement.inserted[column] for column in columns})
+        return statement.prefix_with("IGNORE")
+    
+    if update:
+        return statement.on_conflict_do_update(index_elements=["name"],
+                                               set_={column: statement.excluded[column] for column in columns})
+    return statement.on_conflict_do_nothing(index_elements=["name"])
+
+def upsert_exercises(db: Session, rows, update: bool = False):
+    rows = list(rows)
+    changed = 0
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start:start + UPSERT_BATCH_SIZE]
+        changed += db.execute(upsert_statement(db.bind.dialect.name, batch, update)).rowcount
+    
+    # Only a real change should make the API workers reload the catalog.
+    if changed and not db.execute(bump_catalog_version).rowcount:
+        db.add(CatalogVersion(id=1, version=1))
+    
+    return changed
+
+def seed_exercise(update: bool = False):
     db: Session = SessionLocal()
-    for data in exercise_data:
-        existing_exercise = db.query(Exercise).filter(Exercise.name == data['name']).first()
-        if not existing_exercise:
-            exercise = Exercise(**data)
-            db.add(exercise)
-    db.commit()
-    db.close()
-    print("Exercises seeded successfully")
+    try:
+        changed = upsert_exercises(db, exercise_data, update)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Exercises seeded successfully ({changed} rows changed)")
     
 if __name__ == "__main__":
-    seed_exercise()
\ No newline at end of file
+    seed_exercise(update="--update" in sys.argv)
@@ -0,0 +1,8 @@
+import os
+from dotenv import load_dotenv
+
+# .env is read once, by whichever module asks for a setting first; the
+# rest of the app reads its settings through getenv from here.
+load_dotenv()
+
+getenv = os.getenv
@@ -0,0 +1,45 @@
+import time
+import logging
+
+# Imported first by main.py, so this is when the app started loading.
+import_started = time.perf_counter()
+
+timings = {}
+
+# uvicorn's own logger, so the report lands next to "Application startup
+# complete" under uvicorn and gunicorn alike.
+logger = logging.getLogger("uvicorn.error")
+
+
+def since_import():
+    return time.perf_counter() - import_started
+
+def imported():
+    timings["import"] = since_import()
+
+def ready():
+    timings["ready"] = since_import()
+    logger.info("Imported the app in %.0f ms, ready to serve %.0f ms after import started",
+                timings["import"] * 1000, timings["ready"] * 1000)
+
+
+class FirstRequestTimer:
+    # Reports how long the first request took, which is where anything
+    # lazy (pool connections, the catalog, jwt keys) gets paid for, then
+    # passes every later request straight through.
+    def __init__(self, app):
+        self.app = app
+        self.done = False
+
+    async def __call__(self, scope, receive, send):
+        if self.done or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        self.done = True
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            timings["first_request"] = time.perf_counter() - started
+            logger.info("First request %s %s took %.0f ms, %.0f ms after import started",
+                        scope["method"], scope["path"], timings["first_request"] * 1000, since_import() * 1000)
@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+# Every test module shares one scratch database. This runs before any of
+# them imports database, so the app never sees a real DATABASE_URL.
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# So the periodic auth state refresh can't add its queries mid-test.
+os.environ["AUTH_STATE_REFRESH_INTERVAL"] = "3600"
+# Tests sign in a fair few users from the one client address.
+for name in ("LOGIN_USERNAME_BURST", "LOGIN_IP_BURST", "LOGIN_USERNAME_RATE", "LOGIN_IP_RATE"):
+    os.environ.setdefault(name, "1000000")
+
+import asyncio
+
+import httpx
+import pytest
+
+import database
+from database import Base, engine
+from main import app
+from routers.exercise import catalog_cache
+from seed_exercises import seed_exercise
+from token_cache import auth_state, claims_cache
+
+
+@pytest.fixture(scope="session")
+def loop():
+    # One loop for the whole run: the async engines' pooled connections
+    # belong to the loop that opened them.
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(database.async_engine.dispose())
+    loop.run_until_complete(database.async_read_engine.dispose())
+    loop.close()
+
+
+@pytest.fixture(scope="module")
+def client(loop):
+    # A fresh schema and catalog per module, and nothing cached in the
+    # process from the module before.
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    seed_exercise()
+    catalog_cache.invalidate()
+    claims_cache.clear()
+    auth_state.refreshed_at = None
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    yield client
+    loop.run_until_complete(client.aclose())
+
+
+async def sign_in(client, username: str, is_admin: bool = False):
+    await client.post("/auth/user", json={"username": username, "password": "pw", "is_active": True,
+                                          "is_admin": is_admin})
+    response = await client.post("/auth/token", data={"username": username, "password": "pw"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,52 @@
+import pytest
+from sqlalchemy import event
+
+import database
+from conftest import sign_in
+
+
+@pytest.fixture(scope="module")
+def plan_id(loop, client):
+    async def setup():
+        client.headers.update(await sign_in(client, "counter"))
+        plan = (await client.post("/workout_plan/", json={"schedule": "01-09-2026 08:00",
+                                                          "status": "completed"})).json()
+        await client.post(f"/workout_exercises/bulk?plan_id={plan['id']}",
+                          json=[{"exercise_id": exercise_id, "sets": 3, "reps": 5, "weight": 60.0}
+                                for exercise_id in (1, 2, 3)])
+        return plan["id"]
+
+    return loop.run_until_complete(setup())
+
+
+def count_statements(loop, client, path):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = {database.async_engine.sync_engine, database.async_read_engine.sync_engine}
+    for target in engines:
+        event.listen(target, "before_cursor_execute", record)
+    try:
+        response = loop.run_until_complete(client.get(path))
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", record)
+
+    assert response.status_code == 200, response.text
+    return response, statements
+
+
+def test_plan_exercises_is_one_query(loop, client, plan_id):
+    response, statements = count_statements(loop, client, f"/workout_exercises/?plan_id={plan_id}")
+
+    assert len(response.json()["items"]) == 3
+    assert len(statements) == 1, statements
+
+
+def test_full_plan_is_two_queries(loop, client, plan_id):
+    response, statements = count_statements(loop, client, f"/workout_plan/{plan_id}/full")
+
+    assert len(response.json()["exercises"]) == 3
+    assert len(statements) == 2, statements
@@ -0,0 +1,146 @@
+from itertools import count
+
+import pytest
+from sqlalchemy import select
+
+import records
+import rollups
+from conftest import sign_in
+from database import SessionLocal
+from models import PersonalRecord, WeeklyVolume
+
+IMPORT_CSV = ("schedule,status,exercise_name,sets,reps,weight\n"
+              "2026-02-02T08:00:00,completed,Bench Press,3,5,100\n"
+              "2026-02-02T08:00:00,completed,Running,1,1,0\n"
+              "2026-02-04T08:00:00,completed,Squats,5,5,140\n"
+              "2026-02-06T08:00:00,pending,Deadlift,1,5,180\n")
+
+
+@pytest.fixture(scope="module")
+def headers(loop, client):
+    client.headers.update(loop.run_until_complete(sign_in(client, "rollups")))
+
+
+async def call(request):
+    response = await request
+    assert response.is_success, response.text
+    return response.json()
+
+# Every plan lifts more than the one before, so it holds the personal
+# records and taking it away has to bring them back down.
+heavier = count(100.0, 2.5)
+
+async def new_plan(client, schedule, plan_status="completed", entries=None):
+    if entries is None:
+        weight = next(heavier)
+        entries = ((1, 3, 5, weight), (3, 5, 5, weight + 20))
+    plan = await call(client.post("/workout_plan/", json={"schedule": schedule, "status": plan_status}))
+    await call(client.post("/workout_exercises/bulk", params={"plan_id": plan["id"]},
+                           json=[{"exercise_id": exercise_id, "sets": sets, "reps": reps, "weight": weight}
+                                 for exercise_id, sets, reps, weight in entries]))
+    return plan["id"]
+
+
+# Each write path, run against plans of its own.
+
+async def add(client):
+    plan_id = await new_plan(client, "05-01-2026 08:00")
+    await call(client.post("/workout_exercises/", params={"exercise_id": 2, "plan_id": plan_id},
+                           json={"sets": 1, "reps": 3, "weight": 160.0}))
+
+async def bulk_add(client):
+    await new_plan(client, "06-01-2026 08:00", entries=((1, 4, 8, 80.0), (4, 3, 10, 40.0), (7, 1, 1, 0.0)))
+
+async def status_change(client):
+    completed = await new_plan(client, "12-01-2026 08:00", "pending")
+    await call(client.patch(f"/workout_plan/{completed}/status", json={"status": "completed"}))
+    skipped = await new_plan(client, "13-01-2026 08:00")
+    await call(client.patch(f"/workout_plan/{skipped}/status", json={"status": "skipped"}))
+    uncompleted = await new_plan(client, "14-01-2026 08:00")
+    await call(client.patch(f"/workout_plan/{uncompleted}/status", json={"status": "pending"}))
+
+async def reschedule(client):
+    plan_id = await new_plan(client, "19-01-2026 08:00")
+    await call(client.patch(f"/workout_plan/{plan_id}/schedule", json={"schedule": "28-01-2026 08:00"}))
+
+async def batch_patch(client):
+    moved = await new_plan(client, "20-01-2026 08:00")
+    completed = await new_plan(client, "21-01-2026 08:00", "pending")
+    uncompleted = await new_plan(client, "22-01-2026 08:00")
+    await call(client.patch("/workout_plan/batch", json={"plans": [
+        {"id": moved, "schedule": "03-02-2026 08:00"},
+        {"id": completed, "status": "completed", "schedule": "10-02-2026 08:00"},
+        {"id": uncompleted, "status": "skipped"}]}))
+
+async def entry_delete(client):
+    plan_id = await new_plan(client, "26-01-2026 08:00")
+    await call(client.delete("/workout_exercises/3", params={"plan_id": plan_id}))
+
+async def plan_delete(client):
+    plan_id = await new_plan(client, "27-01-2026 08:00")
+    await call(client.delete(f"/workout_plan/{plan_id}"))
+
+async def bulk_delete(client):
+    await new_plan(client, "19-02-2026 08:00")
+    await new_plan(client, "16-02-2026 08:00")
+    await new_plan(client, "18-02-2026 08:00", "pending")
+    await call(client.delete("/workout_plan/", params={"schedule_from": "2026-02-16T00:00",
+                                                       "schedule_to": "2026-02-18T23:59"}))
+
+async def import_history(client):
+    result = await call(client.post("/workout_plan/import", params={"format": "csv"}, content=IMPORT_CSV))
+    assert result["error_count"] == 0, result["errors"]
+
+
+WRITE_PATHS = [add, bulk_add, status_change, reschedule, batch_patch, entry_delete, plan_delete, bulk_delete,
+               import_history]
+
+
+def stored_and_rebuilt(query, rebuild):
+    # The table as the write paths left it, then as a rebuild from the
+    # workout history has it; the rebuild is rolled back.
+    db = SessionLocal()
+    try:
+        stored = db.execute(query).all()
+        rebuild(db)
+        return stored, db.execute(query).all()
+    finally:
+        db.rollback()
+        db.close()
+
+def weeks(rows):
+    # Weeks taken back to zero sets are left in place and never shown, so
+    # they are skipped here too.
+    return ({tuple(row[:4]): row.sets for row in rows if row.sets},
+            {tuple(row[:4]): row.volume for row in rows if row.sets})
+
+def bests(rows):
+    return {(row.user_id, row.exercise_id, column): getattr(row, column)
+            for row in rows for column in records.RECORD_COLUMNS}
+
+
+@pytest.mark.parametrize("write", WRITE_PATHS, ids=lambda write: write.__name__)
+def test_weekly_volume_matches_a_rebuild(loop, client, headers, write):
+    loop.run_until_complete(write(client))
+
+    stored, rebuilt = stored_and_rebuilt(select(WeeklyVolume.user_id, WeeklyVolume.week_start,
+                                                WeeklyVolume.muscle_category, WeeklyVolume.category,
+                                                WeeklyVolume.sets, WeeklyVolume.volume), rollups.rebuild)
+    stored_sets, stored_volume = weeks(stored)
+    rebuilt_sets, rebuilt_volume = weeks(rebuilt)
+
+    assert rebuilt_sets
+    assert stored_sets == rebuilt_sets
+    assert stored_volume == pytest.approx(rebuilt_volume)
+
+
+@pytest.mark.parametrize("write", WRITE_PATHS, ids=lambda write: write.__name__)
+def test_personal_records_match_a_rebuild(loop, client, headers, write):
+    loop.run_until_complete(write(client))
+
+    stored, rebuilt = stored_and_rebuilt(select(PersonalRecord.user_id, PersonalRecord.exercise_id,
+                                                *(getattr(PersonalRecord, column)
+                                                  for column in records.RECORD_COLUMNS)), records.rebuild)
+
+    assert rebuilt
+    assert bests(stored) == pytest.approx(bests(rebuilt))
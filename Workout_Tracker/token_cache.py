@@ -0,0 +1,98 @@
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from sqlalchemy import select
+from models import Users, RevokedToken
+from database import AsyncSessionLocal
+from settings import getenv
+
+TOKEN_CACHE_SIZE = int(getenv("TOKEN_CACHE_SIZE", "10000"))
+# How often each worker re-reads deactivated users and revoked tokens, so
+# changes made through another worker are picked up within this window.
+AUTH_STATE_REFRESH_INTERVAL = float(getenv("AUTH_STATE_REFRESH_INTERVAL", "5.0"))
+
+
+def token_hash(token: str):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class ClaimsCache:
+    # LRU of already verified token claims. Entries die with the token's
+    # own exp, so a cached token never outlives what jwt.decode allowed.
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            return None
+        
+        self.entries.move_to_end(key)
+        return claims
+
+    def set(self, key: str, claims: dict, expires_at: float):
+        self.entries[key] = (claims, expires_at)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def discard(self, key: str):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class AuthState:
+    # Deactivated user ids and revoked token hashes, mirrored from the
+    # database every AUTH_STATE_REFRESH_INTERVAL seconds instead of being
+    # looked up on every request.
+    def __init__(self):
+        self.deactivated_users = set()
+        self.revoked_tokens = {}
+        self.refreshed_at = None
+        self.lock = asyncio.Lock()
+
+    def is_rejected(self, key: str, user_id: int):
+        return user_id in self.deactivated_users or key in self.revoked_tokens
+
+    async def ensure_fresh(self):
+        if self.refreshed_at is not None and time.monotonic() - self.refreshed_at < AUTH_STATE_REFRESH_INTERVAL:
+            return
+        
+        async with self.lock:
+            if self.refreshed_at is not None and time.monotonic() - self.refreshed_at < AUTH_STATE_REFRESH_INTERVAL:
+                return
+            
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            async with AsyncSessionLocal() as db:
+                deactivated = (await db.scalars(select(Users.id).filter(Users.is_active == False))).all()
+                revoked = (await db.execute(select(RevokedToken.token_hash, RevokedToken.expires_at)
+                                            .filter(RevokedToken.expires_at > now))).all()
+            
+            self.deactivated_users = set(deactivated)
+            self.revoked_tokens = {
+                key: expires_at.replace(tzinfo=timezone.utc).timestamp() for key, expires_at in revoked
+            }
+            self.refreshed_at = time.monotonic()
+
+    def revoke(self, key: str, expires_at: float):
+        self.revoked_tokens[key] = expires_at
+
+    def set_active(self, user_id: int, is_active: bool):
+        if is_active:
+            self.deactivated_users.discard(user_id)
+        else:
+            self.deactivated_users.add(user_id)
+
+
+claims_cache = ClaimsCache(TOKEN_CACHE_SIZE)
+auth_state = AuthState()